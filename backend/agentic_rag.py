@@ -17,13 +17,231 @@ from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
+import asyncio
 import base64
+import functools
+import json
+import hashlib
+import re
+from array import array
+from operator import attrgetter
+from collections import defaultdict, deque
+from statistics import fmean
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+from mcp_client import (
+    get_azure_search_enhanced_fallback_sync,
+    get_shared_client,
+    search_exercises_async,
+)
+
 logger = logging.getLogger(__name__)
 
+# Strips the action prefix when turning a sub-goal into a search term
+# C-level attribute readers for reductions over SearchResult lists; map()
+# with these skips the per-element generator frame
+_GET_SCORE = attrgetter('relevance_score')
+_GET_TYPE = attrgetter('exercise_type')
+_GET_SOURCE = attrgetter('source')
+_GET_DIFFICULTY = attrgetter('difficulty')
+
+_SUBGOAL_PREFIX_RE = re.compile(r'^(find|identify|locate|discover)_')
+
+# Every keyword the profile helpers look for, matched in one linear scan
+# instead of a separate `in` pass per term; the lookahead keeps overlapping
+# keywords (e.g. "machine" inside "cardio machine") individually detectable
+_PROFILE_KEYWORD_RE = re.compile(
+    r'(?=(knee|back|heart'
+    r'|advanced|muscular|athletic|beginner|sedentary|limited experience|intermediate|moderate'
+    r'|dumbbell|weight|gym|machine|barbell|resistance band|band|kettlebell|treadmill|cardio machine))'
+)
+
+
+# Exercise types counted as "too general" by _results_lack_specificity
+_GENERAL_TYPE_RE = re.compile(r'general|basic|beginner|simple')
+
+# One compiled alternation per visual-insight category, so each category is
+# a single scan instead of one `in` pass per term
+_INSIGHT_FORM_RE = re.compile(r'form|posture|alignment|technique')
+_INSIGHT_EQUIPMENT_RE = re.compile(r'dumbbell|barbell|machine|gym|weight|kettlebell|band')
+_INSIGHT_FITNESS_RE = re.compile(r'muscular|athletic|beginner|advanced|experienced|sedentary')
+_INSIGHT_MOBILITY_RE = re.compile(r'flexibility|mobility|stiff|range of motion|tight')
+_INSIGHT_COMPOSITION_RE = re.compile(r'muscle definition|body fat|physique|composition')
+_INSIGHT_POSTURE_RE = re.compile(r'rounded shoulders|forward head|slouch|posture')
+
+
+def _keyword_hits(text_lower: str) -> set:
+    """All profile keywords present in an already-lowercased string"""
+    return {match.group(1) for match in _PROFILE_KEYWORD_RE.finditer(text_lower)}
+
+# All markdown-cleanup rules fused into one alternation so every Vision
+# response is cleaned in a single scan instead of seven sequential passes
+_MD_CLEANUP_RE = re.compile(
+    r'(?P<header>^#{1,6}\s*)'
+    r'|(?P<bolditalic>\*{3}(?P<bolditalic_text>.*?)\*{3})'
+    r'|(?P<bold>\*\*(?P<bold_text>.*?)\*\*)'
+    r'|(?P<italic>\*(?P<italic_text>.*?)\*)'
+    r'|(?P<bullet>^\s*-\s*)'
+    r'|(?P<numbered>^\s*(?P<numbered_text>\d+)\.\s*)'
+    r'|(?P<newlines>\n{3,})'
+    r'|(?P<code>`(?P<code_text>[^`]+)`)',
+    re.MULTILINE
+)
+
+
+def _md_cleanup_repl(match):
+    """Replacement dispatch for the fused markdown-cleanup pattern"""
+    # ***bold italic*** must be tried before bold, or the bold branch
+    # eats the outer ** pairs and strands the inner asterisks
+    if match.group('bolditalic') is not None:
+        return match.group('bolditalic_text')
+    if match.group('bold') is not None:
+        return match.group('bold_text')
+    if match.group('italic') is not None:
+        return match.group('italic_text')
+    if match.group('code') is not None:
+        return match.group('code_text')
+    if match.group('numbered') is not None:
+        return match.group('numbered_text') + '. '
+    if match.group('bullet') is not None:
+        return '- '
+    if match.group('newlines') is not None:
+        return '\n\n'
+    return ''  # header
+
+# Static vision system prompt - kept byte-identical across calls so provider
+# prompt caching can reuse the prefix; per-user details go in the user message
+_VISION_SYSTEM_PROMPT = """You are a professional fitness expert analyzing images for personalized recommendations.
+
+ANALYSIS TASK:
+Analyze the uploaded images and provide detailed observations about:
+
+1. **Physical Assessment**: Body composition, posture, visible muscle development, overall physique
+2. **Form Analysis**: If exercise/movement is shown, analyze form and technique
+3. **Environment**: Available equipment, space, setting (gym, home, outdoor)
+4. **Specific Recommendations**: Based on what you see, what exercises or modifications would be most beneficial
+5. **Visual Cues**: Any specific areas that need attention based on the visual assessment
+
+Provide a comprehensive analysis that will be used to create a personalized fitness plan. Focus on actionable insights based on what you can observe in the images.
+"""
+
+# Disk-backed cache for vision analyses so repeated uploads of the same
+# image(s) skip the expensive GPT-4o Vision round-trip entirely
+_VISION_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "fitness_rag", "vision")
+_vision_cache = {}  # in-process layer over the on-disk cache
+
+# Agent memory persisted across processes so the learning loop survives
+# worker restarts instead of resetting with every new instance
+_AGENT_MEMORY_PATH = os.path.join(os.path.expanduser("~"), ".cache", "fitness_rag", "agent_memory.json")
+
+
+def _load_agent_memory() -> Dict[str, Any]:
+    """Load the persisted agent memory, or an empty structure on first run"""
+    try:
+        if os.path.exists(_AGENT_MEMORY_PATH):
+            with open(_AGENT_MEMORY_PATH, "r", encoding="utf-8") as memory_file:
+                return json.load(memory_file)
+    except Exception as e:
+        logger.warning(f"Agent memory load failed: {e}")
+    return {}
+
+
+def _save_agent_memory(memory: Dict[str, Any]):
+    """Persist agent memory so future processes start from learned state"""
+    try:
+        os.makedirs(os.path.dirname(_AGENT_MEMORY_PATH), exist_ok=True)
+        with open(_AGENT_MEMORY_PATH, "w", encoding="utf-8") as memory_file:
+            json.dump(memory, memory_file)
+    except Exception as e:
+        logger.warning(f"Agent memory save failed: {e}")
+
+# Memoized (user_profile, agent_plan) pairs - both are pure deductions over
+# user_data + image_analysis, so identical inputs always yield the same plan
+_profile_plan_cache = {}
+_PROFILE_PLAN_CACHE_MAX = 1024
+
+
+def _profile_plan_key(user_data: Dict, image_analysis: str) -> Tuple:
+    """Frozen cache key for the profile/plan pair"""
+    frozen_data = tuple(sorted((k, str(v)) for k, v in user_data.items()))
+    analysis_digest = hashlib.blake2b(image_analysis.encode('utf-8'), digest_size=8).hexdigest()
+    return (frozen_data, analysis_digest)
+
+
+def _read_and_encode(img_path: str) -> Optional[Dict[str, Any]]:
+    """Read an image and base64-encode it, run off the event loop.
+
+    Returns the encoded payload as bytes (decoded once later when the
+    OpenAI message is built) plus a content digest for cache keying,
+    or None when the file is missing or unreadable.
+    """
+    try:
+        with open(img_path, "rb") as img_file:
+            img_bytes = img_file.read()
+    except FileNotFoundError:
+        logger.warning(f"⚠️ Image not found: {img_path}")
+        return None
+    except OSError as e:
+        logger.error(f"❌ Failed to read image {img_path}: {e}")
+        return None
+
+    try:
+        return {
+            "filename": os.path.basename(img_path),
+            "data": base64.b64encode(img_bytes),
+            "digest": hashlib.blake2b(img_bytes, digest_size=16).hexdigest()
+        }
+    except Exception as e:
+        logger.error(f"❌ Failed to encode image {img_path}: {e}")
+        return None
+
+
+def _vision_cache_key(image_digests: List[str], user_data: Dict) -> str:
+    """Build a composite cache key from image content hashes and the
+    user_data fields that influence the vision prompt"""
+    hasher = hashlib.blake2b(digest_size=16)
+    for digest in sorted(image_digests):
+        hasher.update(digest.encode('ascii'))
+    profile_fields = (
+        str(user_data.get('gender', '')),
+        str(user_data.get('age', '')),
+        str(user_data.get('weight', '')),
+        str(user_data.get('agent_type', '')),
+        str(user_data.get('health_conditions', ''))
+    )
+    hasher.update("|".join(profile_fields).encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def _vision_cache_get(key: str) -> Optional[str]:
+    """Look up a cached vision analysis, checking memory first then disk"""
+    if key in _vision_cache:
+        return _vision_cache[key]
+    cache_path = os.path.join(_VISION_CACHE_DIR, f"{key}.txt")
+    try:
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as cache_file:
+                analysis = cache_file.read()
+            _vision_cache[key] = analysis
+            return analysis
+    except Exception as e:
+        logger.warning(f"Vision cache read failed for {key}: {e}")
+    return None
+
+
+def _vision_cache_put(key: str, analysis: str):
+    """Store a vision analysis in memory and persist it across restarts"""
+    _vision_cache[key] = analysis
+    try:
+        os.makedirs(_VISION_CACHE_DIR, exist_ok=True)
+        cache_path = os.path.join(_VISION_CACHE_DIR, f"{key}.txt")
+        with open(cache_path, "w", encoding="utf-8") as cache_file:
+            cache_file.write(analysis)
+    except Exception as e:
+        logger.warning(f"Vision cache write failed for {key}: {e}")
+
 class AgentStrategy(Enum):
     """Different strategies the agent can employ"""
     BROAD_SEARCH = "broad_search"
@@ -41,7 +259,7 @@ class SearchResult:
     target_muscles: List[str]
     difficulty: str
 
-@dataclass  
+@dataclass
 class AgentPlan:
     """The agent's plan for achieving user goals"""
     primary_goal: str
@@ -49,6 +267,20 @@ class AgentPlan:
     search_strategies: List[AgentStrategy]
     expected_iterations: int
     success_criteria: Dict[str, float]
+    search_terms: List[str]
+
+
+def _plan_to_dict(plan: AgentPlan) -> Dict[str, Any]:
+    """JSON-safe view of an AgentPlan - flattens the AgentStrategy enums that
+    the default json encoder cannot serialize"""
+    return {
+        "primary_goal": plan.primary_goal,
+        "sub_goals": plan.sub_goals,
+        "search_strategies": [s.value for s in plan.search_strategies],
+        "expected_iterations": plan.expected_iterations,
+        "success_criteria": plan.success_criteria,
+        "search_terms": plan.search_terms
+    }
 
 class AgenticFitnessRAG:
     """
@@ -61,14 +293,77 @@ class AgenticFitnessRAG:
         self.ai_client = azure_openai_client
         self.max_iterations = int(os.getenv("AGENTIC_RAG_MAX_ITERATIONS", "3"))
         self.reflection_mode = os.getenv("AGENTIC_RAG_REFLECTION_MODE", "true").lower() == "true"
-        
-        # Agent memory for learning and adaptation
-        self.search_history = []
-        self.successful_strategies = {}
-        self.user_feedback_patterns = {}
+        # Read the per-request model settings once instead of on every call
+        self.azure_model = os.getenv("AZURE_OPENAI_MODEL", "gpt-4o")
+        self.vision_max_tokens = int(os.getenv("AGENTIC_RAG_MAX_TOKENS", "800"))
+        self.ai_temperature = float(os.getenv("AI_TEMPERATURE", "0.7"))
+        
+        # Agent memory for learning and adaptation, seeded from the shared
+        # on-disk store so learning carries across processes and restarts
+        persisted_memory = _load_agent_memory()
+        self.search_history = persisted_memory.get("search_history", [])
+        # deque(maxlen=10) keeps the sliding window bounded without slicing
+        self.successful_strategies = defaultdict(
+            lambda: deque(maxlen=10),
+            {key: deque(entries, maxlen=10)
+             for key, entries in persisted_memory.get("successful_strategies", {}).items()}
+        )
+        self.user_feedback_patterns = persisted_memory.get("user_feedback_patterns", {})
+        # Running quality totals per strategy so best-strategy analysis is a
+        # dict max instead of re-summing every history on each call
+        self._strategy_totals = {
+            key: sum(entry.get("quality_score", 0) for entry in entries)
+            for key, entries in self.successful_strategies.items()
+        }
+
+        # Columnar (struct-of-arrays) view of the current request's results,
+        # so quality assessment scans flat arrays instead of dataclass fields
+        self._reset_result_columns()
+
+        # O(1) strategy dispatch instead of an if/elif chain of enum compares
+        self._strategy_dispatch = {
+            AgentStrategy.BROAD_SEARCH: self._execute_broad_search,
+            AgentStrategy.TARGETED_SEARCH: self._execute_targeted_search,
+            AgentStrategy.PROGRESSIVE_REFINEMENT: self._execute_progressive_refinement,
+            AgentStrategy.MULTI_ANGLE_APPROACH: self._execute_multi_angle_search,
+        }
         
         logger.info(f"Initialized Agentic RAG with {self.max_iterations} max iterations, reflection_mode={self.reflection_mode}")
     
+    def _reset_result_columns(self):
+        """Reset the per-request columnar result state"""
+        self._scores = array('f')
+        self._etypes = []
+        self._diffs = []
+        self._muscles_flat = []
+        # Running distinct-value sets, updated incrementally so quality
+        # assessment never has to rescan all accumulated results
+        self._seen_etypes = set()
+        self._seen_muscles = set()
+        self._seen_diffs = set()
+        # Fingerprints of results already collected, so overlapping search
+        # terms don't append duplicates that bloat the synthesis prompt
+        self._seen_content_hashes = set()
+
+    def _is_duplicate_result(self, exercise: Dict) -> bool:
+        """Check (and record) a content fingerprint for a raw search hit"""
+        fingerprint = hash((exercise.get("title", ""), exercise.get("content", "")[:200]))
+        if fingerprint in self._seen_content_hashes:
+            return True
+        self._seen_content_hashes.add(fingerprint)
+        return False
+
+    def _record_results(self, results: List[SearchResult]):
+        """Append new results to the columnar arrays used for quality metrics"""
+        for result in results:
+            self._scores.append(result.relevance_score)
+            self._etypes.append(result.exercise_type)
+            self._diffs.append(result.difficulty)
+            self._muscles_flat.extend(result.target_muscles)
+            self._seen_etypes.add(result.exercise_type)
+            self._seen_muscles.update(result.target_muscles)
+            self._seen_diffs.add(result.difficulty)
+
     async def generate_recommendation(self, user_data: Dict, images: List = None) -> Dict[str, Any]:
         """
         Main agentic loop for generating fitness recommendations
@@ -100,15 +395,26 @@ class AgenticFitnessRAG:
                 logger.exception("Full traceback:")
         else:
             logger.info("❌ No images provided for analysis")
-        # Phase 1: Goal Analysis & Strategic Planning
-        user_profile = self._analyze_user_profile(user_data, image_analysis)
-        agent_plan = self._create_strategic_plan(user_profile, images, image_analysis)
+        # Phase 1: Goal Analysis & Strategic Planning (memoized - both steps
+        # are deterministic over user_data + image_analysis)
+        plan_key = _profile_plan_key(user_data, image_analysis)
+        cached_plan = _profile_plan_cache.get(plan_key)
+        if cached_plan is not None:
+            user_profile, agent_plan = cached_plan
+            logger.info("⚡ Reusing cached user profile and strategic plan")
+        else:
+            user_profile = self._analyze_user_profile(user_data, image_analysis)
+            agent_plan = self._create_strategic_plan(user_profile, images, image_analysis)
+            if len(_profile_plan_cache) >= _PROFILE_PLAN_CACHE_MAX:
+                _profile_plan_cache.clear()
+            _profile_plan_cache[plan_key] = (user_profile, agent_plan)
         
         logger.info(f"📋 Agent Plan: {agent_plan.primary_goal} with {len(agent_plan.sub_goals)} sub-goals")
         
         # Phase 2: Iterative Agentic Search & Refinement
         search_results = []
         current_strategy = None
+        self._reset_result_columns()
         
         for iteration in range(self.max_iterations):
             logger.info(f"🔄 Agentic Iteration {iteration + 1}/{self.max_iterations}")
@@ -123,10 +429,9 @@ class AgenticFitnessRAG:
             )
             
             # Self-reflection: Evaluate quality and decide if we need to continue
-            quality_assessment = self._assess_result_quality(
-                iteration_results, agent_plan, search_results
-            )
-            
+            self._record_results(iteration_results)
+            quality_assessment = self._assess_result_quality(iteration_results, agent_plan)
+
             search_results.extend(iteration_results)
             
             logger.info(f"📊 Iteration {iteration + 1} quality: {quality_assessment['overall_score']:.2f}")
@@ -154,12 +459,19 @@ class AgenticFitnessRAG:
         # Add agentic metadata
         final_recommendation.update({
             "agentic_rag": True,
-            "agent_plan": agent_plan.__dict__,
+            "agent_plan": _plan_to_dict(agent_plan),
             "iterations_used": len(search_results),
             "strategies_employed": [s.value for s in [current_strategy]] if current_strategy else [],
             "enhanced_with_intelligence": True
         })
         
+        # Persist what this run learned for future processes
+        _save_agent_memory({
+            "search_history": self.search_history,
+            "successful_strategies": {key: list(entries) for key, entries in self.successful_strategies.items()},
+            "user_feedback_patterns": self.user_feedback_patterns
+        })
+
         logger.info("🎉 Agentic RAG recommendation generation completed")
         return final_recommendation
     
@@ -178,82 +490,74 @@ class AgenticFitnessRAG:
         logger.info(f"✅ AI client available, processing {len(images)} images")
         
         try:
-            # Encode images for analysis
-            encoded_images = []
+            # Encode images concurrently off-thread so the event loop stays free
             logger.info(f"🔍 Debug: Processing {len(images)} image paths")
-            
-            for i, img_path in enumerate(images):
-                logger.info(f"🔍 Debug: Image {i+1}: {img_path}")
-                logger.info(f"🔍 Debug: Image exists: {os.path.exists(img_path)}")
-                
-                if os.path.exists(img_path):
-                    try:
-                        with open(img_path, "rb") as img_file:
-                            encoded = base64.b64encode(img_file.read()).decode('utf-8')
-                            encoded_images.append({
-                                "filename": os.path.basename(img_path),
-                                "data": encoded
-                            })
-                            logger.info(f"✅ Successfully encoded image {i+1}: {os.path.basename(img_path)}")
-                    except Exception as e:
-                        logger.error(f"❌ Failed to encode image {img_path}: {e}")
-                else:
-                    logger.warning(f"⚠️ Image not found: {img_path}")
-            
+            encode_results = await asyncio.gather(
+                *[asyncio.to_thread(_read_and_encode, img_path) for img_path in images]
+            )
+
+            # Drop byte-identical uploads so duplicates never reach the API
+            encoded_images = []
+            seen_digests = set()
+            for result in encode_results:
+                if result is None or result["digest"] in seen_digests:
+                    continue
+                seen_digests.add(result["digest"])
+                encoded_images.append(result)
+            image_digests = [img["digest"] for img in encoded_images]
+
             logger.info(f"🔍 Debug: Successfully encoded {len(encoded_images)} images")
-            
+
             if not encoded_images:
                 logger.warning("❌ No images successfully encoded")
                 return ""
-            
-            # Create comprehensive prompt for fitness analysis
+
+            # Check the content-hash cache before spending a Vision round-trip
+            cache_key = _vision_cache_key(image_digests, user_data)
+            cached_analysis = _vision_cache_get(cache_key)
+            if cached_analysis is not None:
+                logger.info(f"⚡ Vision cache hit for key {cache_key} - skipping API call")
+                return cached_analysis
+
+            # Per-user details ride in the user message so the system prompt
+            # stays a constant, cacheable prefix
             user_info = f"User: {user_data.get('gender', 'Unknown')}, {user_data.get('age', 'Unknown')} years old, {user_data.get('weight', 'Unknown')} lbs"
             user_goal = user_data.get('agent_type', 'general')
             health_conditions = user_data.get('health_conditions', '')
-            
-            vision_prompt = f"""You are a professional fitness expert analyzing images for personalized recommendations.
 
-USER PROFILE:
-{user_info}
-Goal: {user_goal}
-{f"Health/Exercise Notes: {health_conditions}" if health_conditions.strip() else ""}
-
-ANALYSIS TASK:
-Analyze the uploaded images and provide detailed observations about:
-
-1. **Physical Assessment**: Body composition, posture, visible muscle development, overall physique
-2. **Form Analysis**: If exercise/movement is shown, analyze form and technique
-3. **Environment**: Available equipment, space, setting (gym, home, outdoor)
-4. **Specific Recommendations**: Based on what you see, what exercises or modifications would be most beneficial
-5. **Visual Cues**: Any specific areas that need attention based on the visual assessment
+            user_text = (
+                f"USER PROFILE:\n{user_info}\nGoal: {user_goal}\n"
+                + (f"Health/Exercise Notes: {health_conditions}\n" if health_conditions.strip() else "")
+                + f"\nPlease analyze these images for {user_goal} fitness recommendations."
+            )
 
-Provide a comprehensive analysis that will be used to create a personalized fitness plan. Focus on actionable insights based on what you can observe in the images.
-"""
+            image_parts = [
+                {
+                    "type": "image_url",
+                    "image_url": {"url": (b"data:image/jpeg;base64," + img['data']).decode('ascii')}
+                } for img in encoded_images
+            ]
 
             # Call Azure OpenAI Vision API
-            logger.info(f"🤖 Calling Azure OpenAI Vision API with model: {os.getenv('AZURE_OPENAI_MODEL', 'gpt-4o')}")
-            logger.info(f"🔍 Debug: Using endpoint: {os.getenv('AZURE_OPENAI_API_ENDPOINT')}")
-            logger.info(f"🔍 Debug: Max tokens: {os.getenv('AGENTIC_RAG_MAX_TOKENS', '800')}")
+            logger.info(f"🤖 Calling Azure OpenAI Vision API with model: {self.azure_model}")
+            logger.info(f"🔍 Debug: Max tokens: {self.vision_max_tokens}")
             
-            response = self.ai_client.chat.completions.create(
-                model=os.getenv("AZURE_OPENAI_MODEL", "gpt-4o"),
+            create_completion = self.ai_client.chat.completions.create
+            if not asyncio.iscoroutinefunction(create_completion):
+                # Sync client: run the blocking call off the event loop
+                create_completion = functools.partial(asyncio.to_thread, create_completion)
+
+            response = await create_completion(
+                model=self.azure_model,
                 messages=[
-                    {"role": "system", "content": vision_prompt},
+                    {"role": "system", "content": _VISION_SYSTEM_PROMPT},
                     {
-                        "role": "user", 
-                        "content": [
-                            {"type": "text", "text": f"Please analyze these images for {user_goal} fitness recommendations."},
-                            *[
-                                {
-                                    "type": "image_url", 
-                                    "image_url": {"url": f"data:image/jpeg;base64,{img['data']}"}
-                                } for img in encoded_images
-                            ]
-                        ]
+                        "role": "user",
+                        "content": [{"type": "text", "text": user_text}] + image_parts
                     }
                 ],
-                max_tokens=int(os.getenv("AGENTIC_RAG_MAX_TOKENS", "800")),
-                temperature=float(os.getenv("AI_TEMPERATURE", "0.7"))
+                max_tokens=self.vision_max_tokens,
+                temperature=self.ai_temperature
             )
             
             logger.info("✅ Azure OpenAI Vision API call successful!")
@@ -262,7 +566,10 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
             
             # Clean up markdown formatting to prevent visual clutter
             image_analysis = self._clean_markdown_formatting(image_analysis)
-            
+
+            # Persist so repeated uploads of the same images skip the API call
+            _vision_cache_put(cache_key, image_analysis)
+
             logger.info(f"✅ Vision analysis completed: {len(image_analysis)} characters")
             return image_analysis
             
@@ -278,7 +585,10 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
         height = user_data.get('height', None)
         goal = user_data.get('agent_type', 'general')
         health_conditions = user_data.get('health_conditions', '').lower()
-        
+
+        # Lowercase the (potentially multi-KB) analysis a single time here
+        analysis_lower = image_analysis.lower() if image_analysis else ""
+
         # Intelligent profile analysis
         demographics = {"age": age, "gender": gender, "weight": weight}
         
@@ -293,11 +603,11 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
             "demographics": demographics,
             "primary_goal": goal,
             "health_constraints": self._parse_health_constraints(health_conditions),
-            "fitness_level": self._infer_fitness_level(user_data, image_analysis),
+            "fitness_level": self._infer_fitness_level(age, analysis_lower),
             "motivation_level": self._assess_motivation(goal, age),
             "time_availability": self._estimate_time_availability(user_data),
-            "equipment_access": self._infer_equipment_access(user_data, image_analysis),
-            "visual_assessment": self._extract_visual_insights(image_analysis),
+            "equipment_access": self._infer_equipment_access(analysis_lower),
+            "visual_assessment": self._extract_visual_insights(analysis_lower),
             "image_analysis": image_analysis  # Store full analysis for later use
         }
         
@@ -386,7 +696,9 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
             sub_goals=sub_goals,
             search_strategies=strategies,
             expected_iterations=min(len(sub_goals), self.max_iterations),
-            success_criteria=success_criteria
+            success_criteria=success_criteria,
+            # Precompute the per-sub-goal search terms once for the whole plan
+            search_terms=[_SUBGOAL_PREFIX_RE.sub('', goal_name).replace('_', ' ') for goal_name in sub_goals]
         )
     
     def _select_optimal_strategy(self, plan: AgentPlan, current_results: List, iteration: int) -> AgentStrategy:
@@ -407,29 +719,43 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
             # Good base, refine for quality
             return AgentStrategy.PROGRESSIVE_REFINEMENT
         else:
-            # Default fallback
+            # All else equal: prefer the historically best performer from
+            # persisted memory, falling back to the plan's rotation
+            best_strategy = None
+            best_ema = 0.0
+            for candidate in plan.search_strategies:
+                ema = self._strategy_quality_ema(candidate.value)
+                if ema > best_ema:
+                    best_ema = ema
+                    best_strategy = candidate
+            if best_strategy is not None:
+                return best_strategy
             return plan.search_strategies[iteration % len(plan.search_strategies)]
+
+    def _strategy_quality_ema(self, strategy_key: str, alpha: float = 0.3) -> float:
+        """Exponential moving average of a strategy's recorded quality scores"""
+        entries = self.successful_strategies.get(strategy_key)
+        if not entries:
+            return 0.0
+        ema = entries[0].get("quality_score", 0.0)
+        for entry in list(entries)[1:]:
+            ema = alpha * entry.get("quality_score", 0.0) + (1 - alpha) * ema
+        return ema
     
     async def _execute_strategic_search(self, strategy: AgentStrategy, plan: AgentPlan, 
                                        user_profile: Dict, iteration: int) -> List[SearchResult]:
         """Execute search using the selected strategy"""
         
-        if strategy == AgentStrategy.BROAD_SEARCH:
-            return self._execute_broad_search(plan, user_profile)
-        elif strategy == AgentStrategy.TARGETED_SEARCH:
-            return self._execute_targeted_search(plan, user_profile, iteration)
-        elif strategy == AgentStrategy.PROGRESSIVE_REFINEMENT:
-            return self._execute_progressive_refinement(plan, user_profile)
-        elif strategy == AgentStrategy.MULTI_ANGLE_APPROACH:
-            return self._execute_multi_angle_search(plan, user_profile)
-        
-        return []
+        execute = self._strategy_dispatch.get(strategy)
+        if execute is None:
+            return []
+        return await execute(plan, user_profile, iteration)
     
-    def _execute_broad_search(self, plan: AgentPlan, user_profile: Dict) -> List[SearchResult]:
+    async def _execute_broad_search(self, plan: AgentPlan, user_profile: Dict, iteration: int = 0) -> List[SearchResult]:
         """Execute broad search to get diverse results"""
         results = []
         goal = plan.primary_goal
-        
+
         # Broad search terms for comprehensive coverage
         search_terms = {
             "weight_loss": ["cardio", "fat burning", "HIIT", "weight loss exercises"],
@@ -437,43 +763,47 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
             "cardio": ["endurance", "cardiovascular", "aerobic", "cardio training"],
             "strength": ["strength", "powerlifting", "resistance training", "strong"]
         }.get(goal, ["fitness", "exercise", "workout", "training"])
-        
-        # Search with each term
-        for term in search_terms:
-            try:
-                from mcp_client import search_exercises_sync
-                exercises = search_exercises_sync(self.search_client, term, user_profile)
-                
-                for exercise in exercises[:2]:  # Top 2 per search
-                    results.append(SearchResult(
-                        content=exercise.get("content", ""),
-                        relevance_score=exercise.get("score", 0.5),
-                        source="azure_search",
-                        exercise_type=exercise.get("category", "general"),
-                        target_muscles=exercise.get("muscle_groups", []),
-                        difficulty=exercise.get("difficulty", "beginner")
-                    ))
-            except Exception as e:
-                logger.warning(f"Broad search failed for term '{term}': {e}")
-        
+
+        # Fan all terms out concurrently instead of paying one round-trip each
+        term_results = await asyncio.gather(
+            *[search_exercises_async(self.search_client, term, user_profile) for term in search_terms],
+            return_exceptions=True
+        )
+
+        for term, exercises in zip(search_terms, term_results):
+            if isinstance(exercises, Exception):
+                logger.warning(f"Broad search failed for term '{term}': {exercises}")
+                continue
+
+            for exercise in exercises[:2]:  # Top 2 per search
+                if self._is_duplicate_result(exercise):
+                    continue
+                results.append(SearchResult(
+                    content=exercise.get("content", ""),
+                    relevance_score=exercise.get("score", 0.5),
+                    source="azure_search",
+                    exercise_type=exercise.get("category", "general"),
+                    target_muscles=exercise.get("muscle_groups", []),
+                    difficulty=exercise.get("difficulty", "beginner")
+                ))
+
         return results
     
-    def _execute_targeted_search(self, plan: AgentPlan, user_profile: Dict, iteration: int) -> List[SearchResult]:
+    async def _execute_targeted_search(self, plan: AgentPlan, user_profile: Dict, iteration: int) -> List[SearchResult]:
         """Execute highly targeted search for specific needs"""
         results = []
-        
+
         # Use current sub-goal for targeted search
         if iteration < len(plan.sub_goals):
             current_sub_goal = plan.sub_goals[iteration]
-            
-            # Convert sub-goal to specific search terms
-            search_term = current_sub_goal.replace("find_", "").replace("identify_", "").replace("locate_", "").replace("discover_", "").replace("_", " ")
-            
+            search_term = plan.search_terms[iteration]
+
             try:
-                from mcp_client import search_exercises_sync
-                exercises = search_exercises_sync(self.search_client, search_term, user_profile)
-                
+                exercises = await search_exercises_async(self.search_client, search_term, user_profile)
+
                 for exercise in exercises[:3]:  # Top 3 for targeted search
+                    if self._is_duplicate_result(exercise):
+                        continue
                     results.append(SearchResult(
                         content=exercise.get("content", ""),
                         relevance_score=exercise.get("score", 0.6),
@@ -484,20 +814,20 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
                     ))
             except Exception as e:
                 logger.warning(f"Targeted search failed for sub-goal '{current_sub_goal}': {e}")
-        
+
         return results
-    
-    def _execute_progressive_refinement(self, plan: AgentPlan, user_profile: Dict) -> List[SearchResult]:
+
+    async def _execute_progressive_refinement(self, plan: AgentPlan, user_profile: Dict, iteration: int = 0) -> List[SearchResult]:
         """Refine previous searches for higher quality results"""
         # This would typically analyze previous results and search for improvements
         # For now, implement as a high-quality focused search
-        return self._execute_targeted_search(plan, user_profile, 0)
-    
-    def _execute_multi_angle_search(self, plan: AgentPlan, user_profile: Dict) -> List[SearchResult]:
+        return await self._execute_targeted_search(plan, user_profile, 0)
+
+    async def _execute_multi_angle_search(self, plan: AgentPlan, user_profile: Dict, iteration: int = 0) -> List[SearchResult]:
         """Search from multiple angles for comprehensive coverage"""
         results = []
         goal = plan.primary_goal
-        
+
         # Different angles for the same goal
         angle_searches = {
             "weight_loss": ["beginner weight loss", "advanced fat burning", "cardio for weight loss"],
@@ -505,48 +835,46 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
             "cardio": ["running cardio", "HIIT cardio", "low intensity cardio"],
             "strength": ["powerlifting", "bodyweight strength", "dumbbell strength"]
         }.get(goal, ["beginner fitness", "intermediate fitness", "advanced fitness"])
-        
-        for angle in angle_searches:
-            try:
-                from mcp_client import search_exercises_sync
-                exercises = search_exercises_sync(self.search_client, angle, user_profile)
-                
-                for exercise in exercises[:2]:  # Top 2 per angle
-                    results.append(SearchResult(
-                        content=exercise.get("content", ""),
-                        relevance_score=exercise.get("score", 0.55),
-                        source=f"azure_search_angle_{angle.replace(' ', '_')}",
-                        exercise_type=exercise.get("category", "multi_angle"),
-                        target_muscles=exercise.get("muscle_groups", []),
-                        difficulty=exercise.get("difficulty", "varied")
-                    ))
-            except Exception as e:
-                logger.warning(f"Multi-angle search failed for '{angle}': {e}")
-        
+
+        # Query all angles concurrently
+        angle_results = await asyncio.gather(
+            *[search_exercises_async(self.search_client, angle, user_profile) for angle in angle_searches],
+            return_exceptions=True
+        )
+
+        for angle, exercises in zip(angle_searches, angle_results):
+            if isinstance(exercises, Exception):
+                logger.warning(f"Multi-angle search failed for '{angle}': {exercises}")
+                continue
+
+            for exercise in exercises[:2]:  # Top 2 per angle
+                if self._is_duplicate_result(exercise):
+                    continue
+                results.append(SearchResult(
+                    content=exercise.get("content", ""),
+                    relevance_score=exercise.get("score", 0.55),
+                    source=f"azure_search_angle_{angle.replace(' ', '_')}",
+                    exercise_type=exercise.get("category", "multi_angle"),
+                    target_muscles=exercise.get("muscle_groups", []),
+                    difficulty=exercise.get("difficulty", "varied")
+                ))
+
         return results
     
-    def _assess_result_quality(self, new_results: List[SearchResult], plan: AgentPlan, 
-                              all_results: List[SearchResult]) -> Dict[str, float]:
+    def _assess_result_quality(self, new_results: List[SearchResult], plan: AgentPlan) -> Dict[str, float]:
         """Assess the quality of search results against success criteria"""
         
         if not new_results:
             return {"overall_score": 0.0, "relevance": 0.0, "coverage": 0.0, "diversity": 0.0}
-        
-        # Calculate metrics
-        avg_relevance = sum(r.relevance_score for r in new_results) / len(new_results)
-        
+
+        # Calculate metrics from the columnar arrays (new results occupy the tail)
+        avg_relevance = fmean(self._scores[-len(new_results):])
+
         # Coverage: how many sub-goals are addressed
-        all_exercise_types = set(r.exercise_type for r in all_results + new_results)
-        coverage = min(len(all_exercise_types) / len(plan.sub_goals), 1.0)
-        
+        coverage = min(len(self._seen_etypes) / len(plan.sub_goals), 1.0)
+
         # Diversity: variety in muscle groups and difficulty levels
-        all_muscles = set()
-        all_difficulties = set()
-        for r in all_results + new_results:
-            all_muscles.update(r.target_muscles)
-            all_difficulties.add(r.difficulty)
-        
-        diversity = min((len(all_muscles) + len(all_difficulties)) / 10.0, 1.0)  # Normalize
+        diversity = min((len(self._seen_muscles) + len(self._seen_diffs)) / 10.0, 1.0)  # Normalize
         
         # Overall score
         overall_score = (avg_relevance * 0.4 + coverage * 0.3 + diversity * 0.3)
@@ -580,19 +908,21 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
                            quality: Dict):
         """Update agent memory for future learning"""
         strategy_key = strategy.value
-        
-        if strategy_key not in self.successful_strategies:
-            self.successful_strategies[strategy_key] = []
-        
-        self.successful_strategies[strategy_key].append({
-            "quality_score": quality.get("overall_score", 0),
+        quality_score = quality.get("overall_score", 0)
+
+        entries = self.successful_strategies[strategy_key]
+        # Keep the running total in sync with the bounded window: subtract
+        # the entry the deque is about to evict, then add the new score
+        if len(entries) == entries.maxlen:
+            self._strategy_totals[strategy_key] = (
+                self._strategy_totals.get(strategy_key, 0.0) - entries[0].get("quality_score", 0)
+            )
+        entries.append({
+            "quality_score": quality_score,
             "result_count": len(results),
             "timestamp": "current"  # Would use real timestamp in production
         })
-        
-        # Keep only recent successful strategies (sliding window)
-        if len(self.successful_strategies[strategy_key]) > 10:
-            self.successful_strategies[strategy_key] = self.successful_strategies[strategy_key][-10:]
+        self._strategy_totals[strategy_key] = self._strategy_totals.get(strategy_key, 0.0) + quality_score
     
     async def _synthesize_agentic_recommendation(self, search_results: List[SearchResult], 
                                                plan: AgentPlan, user_profile: Dict, 
@@ -610,8 +940,6 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
             exercise_categories[category].append(result)
         
         # Build comprehensive recommendation using fallback with CONVERTED user_data
-        from mcp_client import get_azure_search_enhanced_fallback_sync, FitnessMCPClient
-        
         # Ensure user_data has properly converted types for mathematical operations
         converted_user_data = user_data.copy()
         converted_user_data['age'] = int(user_data.get('age', 30))
@@ -623,20 +951,28 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
             converted_user_data['height'] = str(user_data.get('height'))
         
         # Use the enhanced fallback with properly typed user_data
-        client = FitnessMCPClient()
         base_recommendation = get_azure_search_enhanced_fallback_sync(
-            converted_user_data, images, client
+            converted_user_data, images, get_shared_client()
         )
         
         # Enhance with agentic insights including visual assessment
         visual_insights = user_profile.get("visual_assessment", {})
         
+        # Slice the (potentially long) analysis text once and share the
+        # previews with both enhancement helpers
+        analysis_preview = image_analysis[:150] + "..." if len(image_analysis) > 150 else image_analysis
+        analysis_lower = image_analysis.lower() if image_analysis else ""
+
         agentic_enhancements = {
             "search_strategy_analysis": self._analyze_successful_strategies(),
-            "personalized_insights": self._generate_personalized_insights(user_profile, search_results, image_analysis),
+            "personalized_insights": self._generate_personalized_insights(
+                user_profile, search_results, image_analysis, analysis_preview
+            ),
             "progressive_recommendations": self._create_progressive_plan(plan, search_results),
             "quality_metrics": self._calculate_final_quality_metrics(search_results, plan),
-            "visual_assessment_integration": self._integrate_visual_insights(visual_insights, image_analysis)
+            "visual_assessment_integration": self._integrate_visual_insights(
+                visual_insights, image_analysis, analysis_preview, analysis_lower
+            )
         }
         
         # Combine base recommendation with agentic enhancements
@@ -653,28 +989,36 @@ Provide a comprehensive analysis that will be used to create a personalized fitn
         # Log the status but don't include it in user-facing content
         logger.info(f"� Vision Analysis Status: {image_status}")
         
-        # Start with clean user-facing content
-        enhanced_content = f"""
-{final_recommendation}
-
-Agentic RAG Intelligence Insights
-
-Visual Assessment Integration:
-{agentic_enhancements['visual_assessment_integration']}
-
-Personalized Strategy Analysis:
-{agentic_enhancements['personalized_insights']}
-
-Progressive Plan:
-{agentic_enhancements['progressive_recommendations']}
+        # Start with clean user-facing content; hoist the enhancement fields
+        # once instead of re-doing the dict lookups inside the template
+        quality_metrics = agentic_enhancements['quality_metrics']
+        visual_integration = agentic_enhancements['visual_assessment_integration']
+        personalized_insights = agentic_enhancements['personalized_insights']
+        progressive_plan = agentic_enhancements['progressive_recommendations']
 
-Quality Assessment:
-- Search Quality Score: {agentic_enhancements['quality_metrics']['overall_quality']:.2f}/1.0
-- Coverage Achievement: {agentic_enhancements['quality_metrics']['goal_coverage']:.1%}
-- Recommendation Confidence: {agentic_enhancements['quality_metrics']['confidence']:.1%}
-
-This recommendation was generated using Agentic RAG with vision analysis, {len(search_results)} intelligent search iterations and strategic planning.
-"""
+        enhanced_content = "\n".join([
+            "",
+            final_recommendation,
+            "",
+            "Agentic RAG Intelligence Insights",
+            "",
+            "Visual Assessment Integration:",
+            visual_integration,
+            "",
+            "Personalized Strategy Analysis:",
+            personalized_insights,
+            "",
+            "Progressive Plan:",
+            progressive_plan,
+            "",
+            "Quality Assessment:",
+            f"- Search Quality Score: {quality_metrics['overall_quality']:.2f}/1.0",
+            f"- Coverage Achievement: {quality_metrics['goal_coverage']:.1%}",
+            f"- Recommendation Confidence: {quality_metrics['confidence']:.1%}",
+            "",
+            f"This recommendation was generated using Agentic RAG with vision analysis, {len(search_results)} intelligent search iterations and strategic planning.",
+            ""
+        ])
         
         return {
             "recommendation": enhanced_content,
@@ -688,9 +1032,9 @@ This recommendation was generated using Agentic RAG with vision analysis, {len(s
         """Generate self-reflection insights about the agentic process"""
         return {
             "planning_effectiveness": len(search_results) <= plan.expected_iterations,
-            "goal_achievement": len(set(r.exercise_type for r in search_results)) >= len(plan.sub_goals) * 0.7,
-            "search_efficiency": sum(r.relevance_score for r in search_results) / len(search_results) if search_results else 0,
-            "strategy_adaptation": len(set(r.source for r in search_results)) > 1,
+            "goal_achievement": len(set(map(_GET_TYPE, search_results))) >= len(plan.sub_goals) * 0.7,
+            "search_efficiency": fmean(map(_GET_SCORE, search_results)) if search_results else 0,
+            "strategy_adaptation": len(set(map(_GET_SOURCE, search_results))) > 1,
             "learnings_for_future": "Strategic planning improved recommendation quality and coverage"
         }
     
@@ -698,26 +1042,25 @@ This recommendation was generated using Agentic RAG with vision analysis, {len(s
     def _parse_health_constraints(self, health_conditions: str) -> List[str]:
         """Parse health conditions into actionable constraints"""
         constraints = []
-        if "knee" in health_conditions:
+        hits = _keyword_hits(health_conditions)
+        if "knee" in hits:
             constraints.append("low_impact_preferred")
-        if "back" in health_conditions:
+        if "back" in hits:
             constraints.append("spine_neutral_exercises")
-        if "heart" in health_conditions:
+        if "heart" in hits:
             constraints.append("moderate_intensity_only")
         return constraints
     
-    def _infer_fitness_level(self, user_data: Dict, image_analysis: str = "") -> str:
+    def _infer_fitness_level(self, age: int, analysis_lower: str = "") -> str:
         """Intelligently infer fitness level from available data and visual assessment"""
-        age = int(user_data.get('age', 30))
-        
         # Use image analysis if available
-        if image_analysis:
-            analysis_lower = image_analysis.lower()
-            if "advanced" in analysis_lower or "muscular" in analysis_lower or "athletic" in analysis_lower:
+        if analysis_lower:
+            hits = _keyword_hits(analysis_lower)
+            if hits & {"advanced", "muscular", "athletic"}:
                 return "advanced"
-            elif "beginner" in analysis_lower or "sedentary" in analysis_lower or "limited experience" in analysis_lower:
+            elif hits & {"beginner", "sedentary", "limited experience"}:
                 return "beginner"
-            elif "intermediate" in analysis_lower or "moderate" in analysis_lower:
+            elif hits & {"intermediate", "moderate"}:
                 return "intermediate"
         
         # Fallback to age-based inference
@@ -741,70 +1084,67 @@ This recommendation was generated using Agentic RAG with vision analysis, {len(s
         """Estimate time availability for workouts"""
         return "moderate"  # Default assumption
     
-    def _infer_equipment_access(self, user_data: Dict, image_analysis: str = "") -> List[str]:
+    def _infer_equipment_access(self, analysis_lower: str = "") -> List[str]:
         """Infer likely equipment access from data and visual assessment"""
         equipment = ["bodyweight"]  # Always available
         
         # Use image analysis to detect equipment
-        if image_analysis:
-            analysis_lower = image_analysis.lower()
-            if "dumbbell" in analysis_lower or "weight" in analysis_lower:
+        if analysis_lower:
+            hits = _keyword_hits(analysis_lower)
+            if hits & {"dumbbell", "weight"}:
                 equipment.extend(["dumbbells", "free_weights"])
-            if "gym" in analysis_lower or "machine" in analysis_lower:
+            if hits & {"gym", "machine"}:
                 equipment.extend(["gym_machines", "cable_machine"])
-            if "barbell" in analysis_lower:
+            if "barbell" in hits:
                 equipment.append("barbell")
-            if "resistance band" in analysis_lower or "band" in analysis_lower:
+            if hits & {"resistance band", "band"}:
                 equipment.append("resistance_bands")
-            if "kettlebell" in analysis_lower:
+            if "kettlebell" in hits:
                 equipment.append("kettlebells")
-            if "treadmill" in analysis_lower or "cardio machine" in analysis_lower:
+            if hits & {"treadmill", "cardio machine"}:
                 equipment.append("cardio_machines")
         
         # Default safe options if no equipment detected
         if len(equipment) == 1:  # Only bodyweight
             equipment.extend(["dumbbells", "resistance_bands"])
-            
-        return list(set(equipment))  # Remove duplicates
+
+        # Dedupe while keeping insertion order so the output is deterministic
+        return list(dict.fromkeys(equipment))
     
-    def _extract_visual_insights(self, image_analysis: str) -> Dict[str, Any]:
+    def _extract_visual_insights(self, analysis_lower: str) -> Dict[str, Any]:
         """Extract structured insights from image analysis"""
-        if not image_analysis:
+        if not analysis_lower:
             return {}
-        
-        analysis_lower = image_analysis.lower()
+
         insights = {}
         
         # Form and posture analysis
-        if any(term in analysis_lower for term in ["form", "posture", "alignment", "technique"]):
+        if _INSIGHT_FORM_RE.search(analysis_lower):
             insights["form_issues"] = True
             insights["form_assessment"] = "Requires attention based on visual analysis"
         
         # Equipment detection
-        equipment_terms = ["dumbbell", "barbell", "machine", "gym", "weight", "kettlebell", "band"]
-        if any(term in analysis_lower for term in equipment_terms):
+        if _INSIGHT_EQUIPMENT_RE.search(analysis_lower):
             insights["equipment_available"] = True
             insights["equipment_assessment"] = "Equipment usage opportunities identified"
         
         # Fitness level indicators
-        fitness_terms = ["muscular", "athletic", "beginner", "advanced", "experienced", "sedentary"]
-        if any(term in analysis_lower for term in fitness_terms):
+        if _INSIGHT_FITNESS_RE.search(analysis_lower):
             insights["current_fitness_level"] = True
             insights["fitness_level_visual"] = "Fitness level assessed from visual cues"
         
         # Mobility and flexibility
-        mobility_terms = ["flexibility", "mobility", "stiff", "range of motion", "tight"]
-        if any(term in analysis_lower for term in mobility_terms):
+        if _INSIGHT_MOBILITY_RE.search(analysis_lower):
             insights["mobility_issues"] = True
             insights["mobility_assessment"] = "Mobility considerations identified"
         
         # Body composition insights
-        if any(term in analysis_lower for term in ["muscle definition", "body fat", "physique", "composition"]):
+        if _INSIGHT_COMPOSITION_RE.search(analysis_lower):
             insights["muscle_definition"] = True
             insights["body_composition"] = "Body composition factors noted"
         
         # Posture-specific issues
-        if any(term in analysis_lower for term in ["rounded shoulders", "forward head", "slouch", "posture"]):
+        if _INSIGHT_POSTURE_RE.search(analysis_lower):
             insights["posture_issues"] = True
             insights["postural_assessment"] = "Postural corrections recommended"
         
@@ -812,41 +1152,68 @@ This recommendation was generated using Agentic RAG with vision analysis, {len(s
     
     def _results_lack_specificity(self, results: List[SearchResult]) -> bool:
         """Check if results are too general"""
-        general_terms = ["general", "basic", "beginner", "simple"]
-        general_count = sum(1 for r in results if any(term in r.exercise_type.lower() for term in general_terms))
+        # Scan the exercise-type column once with a precompiled alternation
+        general_count = sum(1 for etype in self._etypes if _GENERAL_TYPE_RE.search(etype.lower()))
         return general_count > len(results) * 0.7
     
     def _results_need_refinement(self, results: List[SearchResult]) -> bool:
         """Check if results would benefit from refinement"""
-        avg_score = sum(r.relevance_score for r in results) / len(results) if results else 0
-        return 0.4 < avg_score < 0.7  # Moderate quality that could be improved
+        # Moderate average quality (0.4-0.7) that could be improved
+        n = len(results)
+        if not n:
+            return False
+        if n < 32:
+            avg_score = fmean(map(_GET_SCORE, results))
+            return 0.4 < avg_score < 0.7
+        # For large batches, walk the scores with running bounds and bail as
+        # soon as the average is decided either way (scores sit in [0, 1]:
+        # once cum can no longer land strictly inside the band even if every
+        # remaining score is 0.0 or 1.0, the answer is already False)
+        low, high = 0.4 * n, 0.7 * n
+        cum = 0.0
+        remaining = n
+        for result in results:
+            cum += result.relevance_score
+            remaining -= 1
+            if cum >= high or cum + remaining <= low:
+                return False
+        return low < cum < high
     
     def _analyze_successful_strategies(self) -> str:
         """Analyze which strategies have been most successful"""
-        if not self.successful_strategies:
+        if not self._strategy_totals:
             return "Initial recommendation - building strategy intelligence."
-        
-        best_strategy = max(self.successful_strategies.keys(), 
-                          key=lambda k: sum(s["quality_score"] for s in self.successful_strategies[k]))
+
+        best_strategy = max(self._strategy_totals, key=self._strategy_totals.__getitem__)
         return f"Analysis suggests {best_strategy.replace('_', ' ')} approach is most effective for your profile."
     
-    def _generate_personalized_insights(self, user_profile: Dict, results: List[SearchResult], image_analysis: str = "") -> str:
+    def _generate_personalized_insights(self, user_profile: Dict, results: List[SearchResult],
+                                        image_analysis: str = "", analysis_preview: str = "") -> str:
         """Generate personalized insights based on search results and visual assessment"""
         goal = user_profile["primary_goal"]
         insights = []
         
         # Include visual insights if available
         if image_analysis:
-            insights.append(f"Visual assessment findings: {image_analysis[:100]}...")
-        
+            insights.append(f"Visual assessment findings: {analysis_preview[:100]}...")
+        
+        # One pass over the results with counters instead of building
+        # per-goal filtered lists
+        cardio_count = 0
+        strength_count = 0
+        for result in results:
+            type_lower = result.exercise_type.lower()
+            if "cardio" in type_lower:
+                cardio_count += 1
+            if "strength" in type_lower:
+                strength_count += 1
+
         if goal == "weight_loss":
-            cardio_results = [r for r in results if "cardio" in r.exercise_type.lower()]
-            if len(cardio_results) >= 3:
+            if cardio_count >= 3:
                 insights.append("Strong focus on cardiovascular exercises detected - excellent for weight loss.")
-        
+
         elif goal == "muscle_gain":
-            strength_results = [r for r in results if "strength" in r.exercise_type.lower()]
-            if len(strength_results) >= 2:
+            if strength_count >= 2:
                 insights.append("Progressive strength training approach identified - optimal for muscle development.")
         
         # Add visual assessment integration
@@ -862,14 +1229,17 @@ This recommendation was generated using Agentic RAG with vision analysis, {len(s
         
         return " ".join(insights)
     
-    def _integrate_visual_insights(self, visual_insights: Dict, image_analysis: str) -> str:
+    def _integrate_visual_insights(self, visual_insights: Dict, image_analysis: str,
+                                   analysis_preview: str = "", analysis_lower: str = "") -> str:
         """Integrate visual assessment findings into recommendations"""
         integration_points = []
         
         if image_analysis and len(image_analysis.strip()) > 50:
-            # Extract key insights from image analysis
-            analysis_lower = image_analysis.lower()
-            
+            # The caller lowercases the analysis once and threads it in,
+            # same as the profile-analysis helpers
+            if not analysis_lower:
+                analysis_lower = image_analysis.lower()
+
             # Add confirmation that analysis was performed
             integration_points.append(f"VISUAL ANALYSIS COMPLETED - {len(image_analysis)} characters of detailed assessment")
             
@@ -891,9 +1261,8 @@ This recommendation was generated using Agentic RAG with vision analysis, {len(s
             if "body" in analysis_lower or "physique" in analysis_lower:
                 integration_points.append("Body composition insights integrated into recommendations")
             
-            # Add preview of analysis
-            preview = image_analysis[:150] + "..." if len(image_analysis) > 150 else image_analysis
-            integration_points.append(f"Analysis Preview: {preview}")
+            # Add preview of analysis (sliced once by the caller)
+            integration_points.append(f"Analysis Preview: {analysis_preview}")
             
         elif image_analysis:
             integration_points.append("Image analysis attempted but returned limited results")
@@ -917,7 +1286,7 @@ This recommendation was generated using Agentic RAG with vision analysis, {len(s
     
     def _create_progressive_plan(self, plan: AgentPlan, results: List[SearchResult]) -> str:
         """Create a progressive plan based on search insights"""
-        difficulties = [r.difficulty for r in results]
+        difficulties = set(map(_GET_DIFFICULTY, results))
         
         if "beginner" in difficulties and "advanced" in difficulties:
             return "Week 1-2: Focus on beginner exercises. Week 3-4: Progress to intermediate. Month 2+: Advance to complex movements."
@@ -930,9 +1299,11 @@ This recommendation was generated using Agentic RAG with vision analysis, {len(s
         """Calculate final quality metrics for the recommendation"""
         if not results:
             return {"overall_quality": 0.0, "goal_coverage": 0.0, "confidence": 0.0}
-        
-        overall_quality = sum(r.relevance_score for r in results) / len(results)
-        goal_coverage = min(len(set(r.exercise_type for r in results)) / len(plan.sub_goals), 1.0)
+
+        # Reduce over the columnar score array and the incremental type set
+        # instead of re-walking the dataclass list
+        overall_quality = fmean(self._scores)
+        goal_coverage = min(len(self._seen_etypes) / len(plan.sub_goals), 1.0)
         confidence = (overall_quality * 0.6 + goal_coverage * 0.4)
         
         return {
@@ -945,28 +1316,7 @@ This recommendation was generated using Agentic RAG with vision analysis, {len(s
         """Clean up markdown formatting to make text more readable in UI"""
         if not text:
             return text
-        
-        import re
-        
-        # Remove markdown headers (### -> clean text)
-        text = re.sub(r'^#{1,6}\s*', '', text, flags=re.MULTILINE)
-        
-        # Clean up bold markdown (**text** -> text)
-        text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-        
-        # Clean up italic markdown (*text* -> text)  
-        text = re.sub(r'\*(.*?)\*', r'\1', text)
-        
-        # Clean up markdown bullet points (- -> -)
-        text = re.sub(r'^\s*-\s*', '- ', text, flags=re.MULTILINE)
-        
-        # Clean up numbered lists
-        text = re.sub(r'^\s*(\d+)\.\s*', r'\1. ', text, flags=re.MULTILINE)
-        
-        # Remove excessive newlines
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        # Clean up any remaining markdown artifacts
-        text = re.sub(r'`([^`]+)`', r'\1', text)  # Remove code ticks
-        
-        return text.strip()
+
+        # Headers, bold/italic markers, bullets, numbered lists, excess
+        # newlines, and code ticks are all handled in one fused pass
+        return _MD_CLEANUP_RE.sub(_md_cleanup_repl, text).strip()
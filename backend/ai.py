@@ -14,20 +14,35 @@ from azure.search.documents.indexes.models import (
     SemanticField,
     SemanticSearch,
     SearchIndex,
+    HnswParameters,
+    ScalarQuantizationCompression,
+    VectorSearchAlgorithmMetric,
     AzureOpenAIVectorizer,
     AzureOpenAIVectorizerParameters
 )
 from azure.core.credentials import AzureKeyCredential
-from openai import AzureOpenAI
+from azure.core.exceptions import ResourceNotFoundError
+from azure.core.pipeline.transport import RequestsTransport
+import cv2
+import numpy as np
+import httpx
+import requests
+from openai import AzureOpenAI, AsyncAzureOpenAI
+import asyncio
+import functools
 import os
 import logging
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv, set_key
 import base64
+import hashlib
 import json
 from mimetypes import guess_type
 import uuid
-from mcp_client import get_fitness_recommendation_sync
+from datetime import datetime, timedelta
+from mcp_client import get_fitness_recommendation_mcp
 
 load_dotenv()
 
@@ -47,18 +62,176 @@ project_endpoint = os.getenv('PROJECT_ENDPOINT')
 
 env_file_path = '.env'
 
+# Completion parameters resolved once at import so the request path doesn't
+# re-read the environment on every call
+# Weekly-plan day names, reused by the plan parsers below
+_DAYS_OF_WEEK = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+AI_MAX_TOKENS = int(os.getenv("AI_MAX_TOKENS", "2500"))
+AI_TEMPERATURE = float(os.getenv("AI_TEMPERATURE", "0.7"))
+AI_FORMATTING_MAX_TOKENS = int(os.getenv("AI_FORMATTING_MAX_TOKENS", "3000"))
+AI_FORMATTING_TEMPERATURE = float(os.getenv("AI_FORMATTING_TEMPERATURE", "0.3"))
+
+
+_MAX_IMAGE_DIM = 1024
+_JPEG_QUALITY = 85
+
+
+def _downscaled_jpeg(image):
+    """Re-encode an image (path or raw bytes) as JPEG capped at 1024 px.
+
+    Phone uploads run 3-8 MB while GPT-4o ingests images as fixed ~512 px
+    tiles, so the extra pixels are pure upload waste; the resize typically
+    shrinks payloads 5-20x. Returns the original bytes when cv2 cannot
+    decode the input.
+    """
+    if isinstance(image, (bytes, bytearray)):
+        img = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return bytes(image)
+    else:
+        img = cv2.imread(image, cv2.IMREAD_COLOR)
+        if img is None:
+            with open(image, "rb") as img_file:
+                return img_file.read()
+    h, w = img.shape[:2]
+    scale = _MAX_IMAGE_DIM / max(h, w)
+    if scale < 1:
+        img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, _JPEG_QUALITY])
+    if not ok:
+        if isinstance(image, (bytes, bytearray)):
+            return bytes(image)
+        with open(image, "rb") as img_file:
+            return img_file.read()
+    return buf.tobytes()
+
+
+@functools.lru_cache(maxsize=256)
+def _encode_image(path, mtime_ns, size):
+    """Downscale and base64-encode an image as a data URL.
+
+    Keyed by (path, mtime, size) so repeat analyses of the same upload skip
+    the decode, resize, and base64 work entirely.
+    """
+    return (b"data:image/jpeg;base64," + base64.b64encode(_downscaled_jpeg(path))).decode('ascii')
+
+
+def _encode_image_cached(image):
+    """Data URL for a path or raw upload bytes; path lookups are cached.
+
+    Raw bytes skip the disk round-trip entirely, so there is nothing to
+    key a cache on and nothing worth caching.
+    """
+    if isinstance(image, (bytes, bytearray)):
+        return (b"data:image/jpeg;base64," + base64.b64encode(_downscaled_jpeg(image))).decode('ascii')
+    st = os.stat(image)
+    return _encode_image(image, st.st_mtime_ns, st.st_size)
+
+# Optional: serving images to GPT-4o as short-lived blob URLs instead of
+# inline base64 avoids the ~33% payload inflation per image. Requires
+# azure-storage-blob plus AZURE_STORAGE_CONNECTION_STRING; without either,
+# the inline data-URL path is used unchanged.
+try:
+    from azure.storage.blob import BlobServiceClient, BlobSasPermissions, generate_blob_sas
+except ImportError:
+    BlobServiceClient = None
+
+_IMAGE_BLOB_CONTAINER = os.getenv("AZURE_STORAGE_IMAGE_CONTAINER", "fitness-uploads")
+_blob_service = None
+
+
+def _get_blob_service():
+    global _blob_service
+    if _blob_service is None and BlobServiceClient is not None:
+        connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+        if connection_string:
+            _blob_service = BlobServiceClient.from_connection_string(connection_string)
+    return _blob_service
+
+
+def _image_reference_url(image):
+    """Return a URL for the vision payload: a 15-minute SAS link when blob
+    storage is configured, otherwise the inline base64 data URL.
+
+    Accepts a path or raw upload bytes. Blobs are named by content so a
+    repeat upload of the same image skips the transfer entirely.
+    """
+    service = _get_blob_service()
+    if service is None:
+        return _encode_image_cached(image)
+    try:
+        if isinstance(image, (bytes, bytearray)):
+            blob_name = hashlib.sha256(image).hexdigest() + ".jpg"
+        else:
+            st = os.stat(image)
+            blob_name = hashlib.sha256(
+                f"{image}|{st.st_mtime_ns}|{st.st_size}".encode("utf-8")
+            ).hexdigest() + ".jpg"
+        blob = service.get_blob_client(_IMAGE_BLOB_CONTAINER, blob_name)
+        if not blob.exists():
+            blob.upload_blob(_downscaled_jpeg(image), overwrite=True)
+        sas_token = generate_blob_sas(
+            account_name=blob.account_name,
+            container_name=_IMAGE_BLOB_CONTAINER,
+            blob_name=blob_name,
+            account_key=service.credential.account_key,
+            permission=BlobSasPermissions(read=True),
+            expiry=datetime.utcnow() + timedelta(minutes=15),
+        )
+        return f"{blob.url}?{sas_token}"
+    except Exception as e:
+        logging.warning(f"Blob upload failed, falling back to inline image: {e}")
+        return _encode_image_cached(image)
+
+
+# One pooled HTTP client per process so every OpenAI call reuses warm
+# TLS/TCP connections instead of paying a fresh handshake. HTTP/2 lets
+# concurrent chat and embedding calls multiplex over one TLS session, but
+# needs the optional h2 package, so fall back to HTTP/1.1 without it.
+_http_limits = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+try:
+    _shared_http = httpx.Client(http2=True, limits=_http_limits, timeout=30)
+    _shared_async_http = httpx.AsyncClient(http2=True, limits=_http_limits, timeout=30)
+except ImportError:
+    _shared_http = httpx.Client(limits=_http_limits, timeout=30)
+    _shared_async_http = httpx.AsyncClient(limits=_http_limits, timeout=30)
+
+# The SDK retries 429/5xx with exponential backoff and honors
+# Retry-After, so transient provider throttling is absorbed here
+# instead of surfacing as a 500 that makes the client re-upload images
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+
 client = AzureOpenAI(
     api_key=api_key,
     api_version=api_version,
     azure_endpoint=azure_endpoint,
+    http_client=_shared_http,
+    max_retries=AI_MAX_RETRIES,
 )
 
 embedding_client = AzureOpenAI(
     api_key=api_key,
     api_version=api_version,
     azure_endpoint=azure_endpoint,
+    http_client=_shared_http,
+    max_retries=AI_MAX_RETRIES,
 )
 
+# Shared async client so callers that can await don't tie up a worker
+# thread for the multi-second vision inference
+async_client = AsyncAzureOpenAI(
+    api_key=api_key,
+    api_version=api_version,
+    azure_endpoint=azure_endpoint,
+    http_client=_shared_async_http,
+    max_retries=AI_MAX_RETRIES,
+)
+
+# Azure Search clients share one pooled requests session the same way
+_search_session = requests.Session()
+_search_transport = RequestsTransport(session=_search_session, session_owner=False)
+
 search_client = None
 index_client = None
 
@@ -68,28 +241,244 @@ if search_service_endpoint and search_api_key:
         search_client = SearchClient(
             endpoint=search_service_endpoint,
             index_name=index_name,
-            credential=AzureKeyCredential(search_api_key)
+            credential=AzureKeyCredential(search_api_key),
+            transport=_search_transport
         )
 
         index_client = SearchIndexClient(
             endpoint=search_service_endpoint,
-            credential=AzureKeyCredential(search_api_key)
+            credential=AzureKeyCredential(search_api_key),
+            transport=_search_transport
         )
     except Exception as e:
         print(f"Warning: Could not initialize Azure Search clients: {e}")
         search_client = None
         index_client = None
 
+# Semantic response cache: near-duplicate requests (same profile plus a
+# visually similar image) are answered from the Azure AI Search index
+# instead of re-running the multi-second vision inference
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+
+def _image_dhash(image):
+    """64-bit difference hash so visually similar uploads key the same"""
+    if isinstance(image, (bytes, bytearray)):
+        img = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            return hashlib.blake2b(image, digest_size=8).hexdigest()
+    else:
+        img = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            # Unreadable as an image; fall back to size so the key stays stable
+            return f"{os.stat(image).st_size:x}"
+    small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = 0
+    for row in small.tolist():
+        for left, right in zip(row, row[1:]):
+            bits = (bits << 1) | (left < right)
+    return f"{bits:016x}"
+
+
+# Exact-reuse answer cache: resubmitting the same images with the same
+# bucketed profile returns the stored answer with no embedding or LLM
+# call at all. Entries live on disk with a 7-day TTL.
+_ANSWER_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "fitness_rag", "answers")
+_ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def _answer_cache_key(image_paths, gender, age, weight, height, agent_type, health_conditions):
+    """Perceptual image hashes plus a bucketed profile (5-year age bands,
+    10-lb weight bands, 2-inch height bands) so trivially different
+    inputs still hit"""
+    try:
+        age_bucket = int(float(age)) // 5
+        weight_bucket = int(float(weight)) // 10
+    except (TypeError, ValueError):
+        age_bucket, weight_bucket = age, weight
+    try:
+        height_bucket = int(float(height)) // 2 if height else ""
+    except (TypeError, ValueError):
+        height_bucket = height
+    img_hashes = ",".join(_image_dhash(p) for p in image_paths)
+    raw = f"{img_hashes}|{gender}|{age_bucket}|{weight_bucket}|{height_bucket}|{agent_type}|{health_conditions.strip()}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _answer_cache_get(key):
+    cache_path = os.path.join(_ANSWER_CACHE_DIR, f"{key}.json")
+    try:
+        with open(cache_path) as cache_file:
+            entry = json.load(cache_file)
+        if time.time() - entry["stored_at"] <= _ANSWER_CACHE_TTL:
+            return entry["answer"]
+        os.remove(cache_path)
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _answer_cache_put(key, answer):
+    try:
+        os.makedirs(_ANSWER_CACHE_DIR, exist_ok=True)
+        with open(os.path.join(_ANSWER_CACHE_DIR, f"{key}.json"), "w") as cache_file:
+            json.dump({"stored_at": time.time(), "answer": answer}, cache_file)
+    except OSError:
+        pass
+
+
+def _semantic_cache_question(image_paths, gender, age, weight, height, agent_type, health_conditions):
+    """Canonical cache key covering the profile and image content"""
+    img_hashes = ",".join(_image_dhash(p) for p in image_paths)
+    return f"{gender}|{age}|{weight}|{height}|{agent_type}|{health_conditions.strip()}|{img_hashes}"
+
+
+_EMBED_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "fitness_rag", "embeddings")
+
+
+@functools.lru_cache(maxsize=4096)
+def _embed(text):
+    """Embedding for a canonical cache question, memoized in-process.
+
+    Backed by a sha256-keyed disk cache so repeat queries after a restart
+    also skip the embeddings round-trip. Returned as a tuple so lru_cache
+    entries stay hashable; call sites convert to list as needed.
+    """
+    key = hashlib.sha256(f"{embedding_model}|{text}".encode("utf-8")).hexdigest()
+    cache_path = os.path.join(_EMBED_CACHE_DIR, f"{key}.json")
+    try:
+        with open(cache_path) as cache_file:
+            return tuple(json.load(cache_file))
+    except (OSError, ValueError):
+        pass
+    embedding = embedding_client.embeddings.create(
+        model=embedding_model, input=[text]
+    ).data[0].embedding
+    try:
+        os.makedirs(_EMBED_CACHE_DIR, exist_ok=True)
+        with open(cache_path, "w") as cache_file:
+            json.dump(embedding, cache_file)
+    except OSError:
+        pass
+    return tuple(embedding)
+
+
+def _cache_query(embedding, exhaustive):
+    """Single nearest-neighbour probe against the cache index"""
+    return search_client.search(
+        search_text=None,
+        vector_queries=[VectorizedQuery(
+            vector=embedding, k_nearest_neighbors=1, fields="contentVector",
+            exhaustive=exhaustive
+        )],
+        select=["answer"],
+        top=1,
+    )
+
+
+def _semantic_cache_lookup(question):
+    """Return (cached_answer, query_embedding); answer is None on a miss.
+
+    Adaptive effort: the first probe uses the index's ANN graph, which is
+    tuned for fast negatives since a miss just falls through to the LLM.
+    Scores landing in the gray band just under the threshold get one
+    exhaustive (exact KNN) confirm query, so borderline hits aren't lost
+    to ANN approximation.
+    """
+    embedding = list(_embed(question))
+    # Cosine-metric hits are scored 1/(1 + (1 - cos)); invert the cosine
+    # thresholds once rather than converting every score back
+    min_score = 1.0 / (2.0 - SEMANTIC_CACHE_THRESHOLD)
+    gray_score = 1.0 / (2.0 - (SEMANTIC_CACHE_THRESHOLD - 0.05))
+    for doc in _cache_query(embedding, exhaustive=False):
+        score = doc["@search.score"]
+        if score >= min_score and doc.get("answer"):
+            return doc["answer"], embedding
+        if score >= gray_score:
+            for confirm in _cache_query(embedding, exhaustive=True):
+                if confirm["@search.score"] >= min_score and confirm.get("answer"):
+                    return confirm["answer"], embedding
+    return None, embedding
+
+
+def _semantic_cache_store(question, answer, embedding):
+    ensure_index()
+    search_client.upload_documents([{
+        "chunk_id": str(uuid.uuid4()),
+        "question": question,
+        "answer": answer,
+        "contentVector": embedding,
+    }])
+
+
+async def embed_many(texts, batch=16):
+    """Embed texts in concurrent batches on the shared async client.
+
+    The embeddings API accepts list input, so N texts cost ceil(N/batch)
+    round-trips fired concurrently instead of N sequential calls.
+    """
+    chunks = [texts[i:i + batch] for i in range(0, len(texts), batch)]
+    responses = await asyncio.gather(
+        *[async_client.embeddings.create(model=embedding_model, input=chunk)
+          for chunk in chunks]
+    )
+    return [item.embedding for response in responses for item in response.data]
+
+
+async def bulk_cache_upload(pairs, batch=16):
+    """Warm or rebuild the semantic cache from (question, answer) pairs.
+
+    Embeds every question via embed_many and pushes all documents with a
+    single upload_documents call. Returns the number of documents stored.
+    """
+    if not pairs or search_client is None:
+        return 0
+    embeddings = await embed_many([question for question, _ in pairs], batch=batch)
+    documents = [
+        {
+            "chunk_id": str(uuid.uuid4()),
+            "question": question,
+            "answer": answer,
+            "contentVector": embedding,
+        }
+        for (question, answer), embedding in zip(pairs, embeddings)
+    ]
+    await asyncio.to_thread(search_client.upload_documents, documents)
+    return len(documents)
+
+
 def create_vector_search():
     vector_search = VectorSearch(
         algorithms=[
-            HnswAlgorithmConfiguration(name="myHnsw")
+            # Explicit HNSW tuning: m=10 is the densest graph the service
+            # accepts (valid range 4-10) and keeps recall high on a small
+            # cache index; ef_search=100 holds query latency under defaults
+            HnswAlgorithmConfiguration(
+                name="myHnsw",
+                parameters=HnswParameters(
+                    m=10,
+                    ef_construction=200,
+                    ef_search=100,
+                    metric=VectorSearchAlgorithmMetric.COSINE,
+                ),
+            )
         ],
         profiles=[
             VectorSearchProfile(
                 name="myHnswProfile",
                 algorithm_configuration_name="myHnsw",
-                vectorizer_name="myVectorizer"
+                vectorizer_name="myVectorizer",
+                compression_name="sq"
+            )
+        ],
+        # Scalar (int8) quantization cuts stored vector bytes 4x; reranking
+        # a small oversampled candidate set against the original FP32
+        # vectors keeps recall effectively unchanged
+        compressions=[
+            ScalarQuantizationCompression(
+                compression_name="sq",
+                rerank_with_original_vectors=True,
+                default_oversampling=4,
             )
         ],
         vectorizers=[
@@ -125,43 +514,42 @@ def create_index():
             )
         ]
     )
+    global _INDEX_READY
     try:
         index_schema.vector_search = create_vector_search()
         index_client.create_index(index_schema)
+        _INDEX_READY = True
     except Exception as e:
         logging.error(f"Failed to create index: {e}")
 
-def get_fitness_recommendation(image_paths, gender, age, weight, height=None, agent_type="general", health_conditions=""):
-    """
-    Enhanced fitness recommendation using both GPT-4o vision and MCP tools.
-    """
-    
-    # For faster response, run MCP in background and prioritize vision analysis
-    vision_analysis = None
-    mcp_recommendations = {}
-    
-    # Process images for vision analysis first (this is the main feature)
-    encoded_images = []
-    for img_path in image_paths:
-        with open(img_path, "rb") as img_file:
-            encoded = base64.b64encode(img_file.read()).decode('utf-8')
-            encoded_images.append({
-                "filename": os.path.basename(img_path),
-                "data": encoded
-            })
-
-    # Enhanced prompt for comprehensive fitness analysis
-    user_info = f"User: {gender}, {age} years old, {weight} lbs"
-    if height:
-        user_info += f", {height} inches tall"
-    user_info += f", Goal: {agent_type}"
-    if health_conditions.strip():
-        user_info += f"\nHealth/Exercise Notes: {health_conditions}"
-    
-    prompt = f"""You are a professional fitness expert and certified personal trainer. Analyze the uploaded images and provide a comprehensive personalized fitness assessment and recommendations.
+
+# One-shot boot flag: once the index is known to exist, callers skip the
+# control-plane round-trip entirely
+_INDEX_READY = False
+
+
+def ensure_index():
+    """Make sure the semantic-cache index exists, checking at most once."""
+    global _INDEX_READY
+    if _INDEX_READY or index_client is None:
+        return
+    try:
+        index_client.get_index(index_name)
+        _INDEX_READY = True
+        return
+    except ResourceNotFoundError:
+        pass
+    except Exception as e:
+        logging.error(f"Failed to check index existence: {e}")
+        return
+    create_index()
+
+# Static portion of the vision prompt interned once at import; only the
+# user details and goal are substituted per call
+_VISION_PROMPT_TEMPLATE = """You are a professional fitness expert and certified personal trainer. Analyze the uploaded images and provide a comprehensive personalized fitness assessment and recommendations.
 
 USER PROFILE:
-{user_info}
+%(user_info)s
 
 COMPREHENSIVE ANALYSIS REQUIRED:
 
@@ -175,7 +563,7 @@ COMPREHENSIVE ANALYSIS REQUIRED:
 ## 2. **WEEKLY EXERCISE STRUCTURE** (Provide 7-day breakdown)
 **MONDAY - Upper Body Focus:**
 - 3-4 specific exercises with sets/reps (e.g., "3 sets of 8-12 push-ups")
-- Target: {agent_type} goals
+- Target: %(agent_type)s goals
 
 **TUESDAY - Cardiovascular Training:**
 - Cardio recommendations with duration
@@ -190,11 +578,11 @@ COMPREHENSIVE ANALYSIS REQUIRED:
 - Recovery recommendations
 
 **FRIDAY - Full Body Circuit:**
-- Combined movements for {agent_type}
+- Combined movements for %(agent_type)s
 - Challenge progression
 
 **SATURDAY - Goal-Specific Training:**
-- Specialized workout for {agent_type} objectives
+- Specialized workout for %(agent_type)s objectives
 - Equipment-based or bodyweight options
 
 **SUNDAY - Rest or Light Activity:**
@@ -204,60 +592,128 @@ COMPREHENSIVE ANALYSIS REQUIRED:
 ## 3. **NUTRITION GUIDANCE**
 - Meal timing recommendations
 - Hydration guidelines
-- Supplements if appropriate for {agent_type}
+- Supplements if appropriate for %(agent_type)s
 
 ## 4. **PROGRESS TRACKING & NEXT STEPS**
 - Key metrics to monitor
 - When to progress exercises
 - Signs of improvement to watch for
 
-**IMPORTANT**: Tailor ALL recommendations specifically for {agent_type} goals and consider any health conditions mentioned. Provide specific, actionable advice that can be implemented immediately.
-{' CRITICAL: Address any health conditions/limitations mentioned above in all recommendations.' if health_conditions.strip() else ''}"""
+**IMPORTANT**: Tailor ALL recommendations specifically for %(agent_type)s goals and consider any health conditions mentioned. Provide specific, actionable advice that can be implemented immediately.
+%(health_note)s"""
+
+
+def _build_vision_prompt(gender, age, weight, height, agent_type, health_conditions):
+    """Build the system prompt shared by the sync and async vision paths"""
+    user_info = f"User: {gender}, {age} years old, {weight} lbs"
+    if height:
+        user_info += f", {height} inches tall"
+    user_info += f", Goal: {agent_type}"
+    if health_conditions.strip():
+        user_info += f"\nHealth/Exercise Notes: {health_conditions}"
+        health_note = ' CRITICAL: Address any health conditions/limitations mentioned above in all recommendations.'
+    else:
+        health_note = ''
+
+    return _VISION_PROMPT_TEMPLATE % {
+        "user_info": user_info,
+        "agent_type": agent_type,
+        "health_note": health_note,
+    }
+
+
+def get_fitness_recommendation(image_paths, gender, age, weight, height=None, agent_type="general", health_conditions=""):
+    """
+    Enhanced fitness recommendation using both GPT-4o vision and MCP tools.
+    """
+    
+    # For faster response, run MCP in background and prioritize vision analysis
+    vision_analysis = None
+    mcp_recommendations = {}
+
+    # Exact-image reuse first: no embedding, no search, no LLM
+    answer_key = _answer_cache_key(image_paths, gender, age, weight, height, agent_type, health_conditions)
+    cached_answer = _answer_cache_get(answer_key)
+    if cached_answer:
+        return cached_answer
+
+    # Then the semantic cache: a hit skips the encode and vision call
+    # entirely. Cache failures must never break the main path.
+    cache_question = cache_embedding = None
+    if search_client is not None:
+        try:
+            cache_question = _semantic_cache_question(
+                image_paths, gender, age, weight, height, agent_type, health_conditions
+            )
+            cached_answer, cache_embedding = _semantic_cache_lookup(cache_question)
+            if cached_answer:
+                return cached_answer
+        except Exception as e:
+            logging.warning(f"Semantic cache lookup failed: {e}")
+
+    # Process images for vision analysis first (this is the main feature);
+    # repeat uploads come straight from the encode cache, and fresh files
+    # are read and encoded in parallel instead of serially on the hot path
+    if len(image_paths) > 1:
+        with ThreadPoolExecutor(max_workers=min(8, len(image_paths))) as executor:
+            image_urls = list(executor.map(_image_reference_url, image_paths))
+    else:
+        image_urls = [_image_reference_url(img_path) for img_path in image_paths]
+
+    prompt = _build_vision_prompt(gender, age, weight, height, agent_type, health_conditions)
 
     try:
-        # Get vision analysis with shorter response for speed
+        # Get vision analysis; stream the completion so generated text is
+        # consumed as it arrives instead of waiting for the final token
         response = client.chat.completions.create(
             model=model,
             messages=[
                 {"role": "system", "content": prompt},
                 *[
-                    {"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img['data']}"}}]} 
-                    for img in encoded_images
+                    {"role": "user", "content": [{"type": "image_url", "image_url": {"url": url}}]}
+                    for url in image_urls
                 ]
             ],
-            max_tokens=int(os.getenv("AI_MAX_TOKENS", "2500")),
-            temperature=float(os.getenv("AI_TEMPERATURE", "0.7")),
+            max_tokens=AI_MAX_TOKENS,
+            temperature=AI_TEMPERATURE,
+            stream=True,
         )
+
+        analysis_chunks = []
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                analysis_chunks.append(chunk.choices[0].delta.content)
+        vision_analysis = "".join(analysis_chunks)
         
-        vision_analysis = response.choices[0].message.content
-        
-        # Try to get MCP enhancements quickly (with timeout)
+        # Try to get MCP enhancements quickly (with timeout); the fallback
+        # runs in a worker thread, so on timeout the await is abandoned and
+        # the thread finishes in the background
         try:
-            import threading
-            import time
-            
-            def get_mcp_data():
-                return get_fitness_recommendation_sync(
-                    images=encoded_images,
-                    gender=gender,
-                    age=int(age),
-                    weight=float(weight),
-                    agent_type=agent_type
+            mcp_recommendations = asyncio.run(
+                asyncio.wait_for(
+                    get_fitness_recommendation_mcp(
+                        images=image_urls,
+                        gender=gender,
+                        age=int(age),
+                        weight=float(weight),
+                        height=height,
+                        agent_type=agent_type,
+                        health_conditions=health_conditions,
+                    ),
+                    timeout=5.0,
                 )
-            
-            # Try MCP with 5 second timeout
-            thread = threading.Thread(target=lambda: setattr(get_mcp_data, 'result', get_mcp_data()))
-            thread.daemon = True
-            thread.start()
-            thread.join(timeout=5.0)
-            
-            if hasattr(get_mcp_data, 'result'):
-                mcp_recommendations = getattr(get_mcp_data, 'result')
+            )
         except Exception as e:
             logging.warning(f"MCP enhancement skipped due to timeout/error: {e}")
         
         # Return the vision analysis immediately (main feature)
         if vision_analysis:
+            _answer_cache_put(answer_key, vision_analysis)
+            if cache_embedding is not None:
+                try:
+                    _semantic_cache_store(cache_question, vision_analysis, cache_embedding)
+                except Exception as e:
+                    logging.warning(f"Semantic cache store failed: {e}")
             return vision_analysis
         else:
             return "Analysis complete - please try uploading a clearer image for better recommendations."
@@ -266,6 +722,165 @@ COMPREHENSIVE ANALYSIS REQUIRED:
         logging.error(f"GPT-4o vision API error: {e}")
         return "An error occurred while analyzing your image. Please try again with a different photo."
 
+
+def get_fitness_recommendation_stream(image_paths, gender, age, weight, height=None, agent_type="general", health_conditions=""):
+    """
+    Streaming variant of get_fitness_recommendation that yields text deltas.
+
+    Time-to-first-byte drops to roughly first-token latency: the Flask
+    route forwards each delta over SSE while the full analysis is still
+    accumulated here so cache persistence works exactly like the blocking
+    path. A semantic-cache hit is yielded as a single chunk.
+    """
+    answer_key = _answer_cache_key(image_paths, gender, age, weight, height, agent_type, health_conditions)
+    cached_answer = _answer_cache_get(answer_key)
+    if cached_answer:
+        yield cached_answer
+        return
+
+    cache_question = cache_embedding = None
+    if search_client is not None:
+        try:
+            cache_question = _semantic_cache_question(
+                image_paths, gender, age, weight, height, agent_type, health_conditions
+            )
+            cached_answer, cache_embedding = _semantic_cache_lookup(cache_question)
+            if cached_answer:
+                yield cached_answer
+                return
+        except Exception as e:
+            logging.warning(f"Semantic cache lookup failed: {e}")
+
+    if len(image_paths) > 1:
+        with ThreadPoolExecutor(max_workers=min(8, len(image_paths))) as executor:
+            image_urls = list(executor.map(_image_reference_url, image_paths))
+    else:
+        image_urls = [_image_reference_url(img_path) for img_path in image_paths]
+
+    prompt = _build_vision_prompt(gender, age, weight, height, agent_type, health_conditions)
+
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": prompt},
+                *[
+                    {"role": "user", "content": [{"type": "image_url", "image_url": {"url": url}}]}
+                    for url in image_urls
+                ]
+            ],
+            max_tokens=AI_MAX_TOKENS,
+            temperature=AI_TEMPERATURE,
+            stream=True,
+        )
+
+        analysis_chunks = []
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                delta = chunk.choices[0].delta.content
+                analysis_chunks.append(delta)
+                yield delta
+    except Exception as e:
+        logging.error(f"GPT-4o vision API error: {e}")
+        yield "An error occurred while analyzing your image. Please try again with a different photo."
+        return
+
+    vision_analysis = "".join(analysis_chunks)
+    if vision_analysis:
+        _answer_cache_put(answer_key, vision_analysis)
+        if cache_embedding is not None:
+            try:
+                _semantic_cache_store(cache_question, vision_analysis, cache_embedding)
+            except Exception as e:
+                logging.warning(f"Semantic cache store failed: {e}")
+
+
+async def get_fitness_recommendation_async(image_paths, gender, age, weight, height=None, agent_type="general", health_conditions=""):
+    """
+    Async variant of get_fitness_recommendation.
+
+    Encodes images off-thread and awaits the vision call on the shared
+    AsyncAzureOpenAI client, so batch callers can gather several analyses
+    concurrently without tying up worker threads.
+    """
+    answer_key = _answer_cache_key(image_paths, gender, age, weight, height, agent_type, health_conditions)
+    cached_answer = await asyncio.to_thread(_answer_cache_get, answer_key)
+    if cached_answer:
+        return cached_answer
+
+    cache_question = cache_embedding = None
+    if search_client is not None:
+        try:
+            cache_question = _semantic_cache_question(
+                image_paths, gender, age, weight, height, agent_type, health_conditions
+            )
+            cached_answer, cache_embedding = await asyncio.to_thread(
+                _semantic_cache_lookup, cache_question
+            )
+            if cached_answer:
+                return cached_answer
+        except Exception as e:
+            logging.warning(f"Semantic cache lookup failed: {e}")
+
+    image_urls = await asyncio.gather(
+        *[asyncio.to_thread(_image_reference_url, img_path) for img_path in image_paths]
+    )
+
+    prompt = _build_vision_prompt(gender, age, weight, height, agent_type, health_conditions)
+
+    try:
+        # Run the vision call and the MCP enhancement truly concurrently;
+        # the MCP task is capped at 5 s and never blocks the vision result
+        vision_task = asyncio.create_task(async_client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": prompt},
+                *[
+                    {"role": "user", "content": [{"type": "image_url", "image_url": {"url": url}}]}
+                    for url in image_urls
+                ]
+            ],
+            max_tokens=AI_MAX_TOKENS,
+            temperature=AI_TEMPERATURE,
+        ))
+        mcp_task = asyncio.create_task(asyncio.wait_for(
+            get_fitness_recommendation_mcp(
+                images=image_urls,
+                gender=gender,
+                age=int(age),
+                weight=float(weight),
+                height=height,
+                agent_type=agent_type,
+                health_conditions=health_conditions,
+            ),
+            timeout=5.0,
+        ))
+        response, mcp_recommendations = await asyncio.gather(
+            vision_task, mcp_task, return_exceptions=True
+        )
+        if isinstance(response, Exception):
+            raise response
+        if isinstance(mcp_recommendations, Exception):
+            logging.warning(f"MCP enhancement skipped due to timeout/error: {mcp_recommendations}")
+
+        vision_analysis = response.choices[0].message.content
+        if vision_analysis:
+            await asyncio.to_thread(_answer_cache_put, answer_key, vision_analysis)
+            if cache_embedding is not None:
+                try:
+                    await asyncio.to_thread(
+                        _semantic_cache_store, cache_question, vision_analysis, cache_embedding
+                    )
+                except Exception as e:
+                    logging.warning(f"Semantic cache store failed: {e}")
+            return vision_analysis
+        return "Analysis complete - please try uploading a clearer image for better recommendations."
+
+    except Exception as e:
+        logging.error(f"GPT-4o vision API error: {e}")
+        return "An error occurred while analyzing your image. Please try again with a different photo."
+
+
 def normalize_weekly_plan_structure(plan):
     """
     Ensure all days in the weekly plan have the correct structure
@@ -438,8 +1053,8 @@ Follow this structure EXACTLY with proper EXERCISES/ACTIVITIES sections."""
             messages=[
                 {"role": "system", "content": prompt}
             ],
-            max_tokens=int(os.getenv("AI_FORMATTING_MAX_TOKENS", "3000")),
-            temperature=float(os.getenv("AI_FORMATTING_TEMPERATURE", "0.3"))
+            max_tokens=AI_FORMATTING_MAX_TOKENS,
+            temperature=AI_FORMATTING_TEMPERATURE
         )
         
         weekly_plan_text = response.choices[0].message.content
@@ -608,7 +1223,7 @@ def parse_weekly_plan_response_improved(plan_text, agent_type):
     # Ensure all 7 days are present with fallbacks
     if len(parsed_plan['dailyPlans']) < 7:
         fallback_plans = get_fallback_daily_plans(agent_type)
-        for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']:
+        for day in _DAYS_OF_WEEK:
             if day not in parsed_plan['dailyPlans']:
                 parsed_plan['dailyPlans'][day] = fallback_plans.get(day, {
                     'exercises': ['Light bodyweight movement', 'Gentle stretching routine', '15-20 minutes walking'],
@@ -727,7 +1342,7 @@ def parse_weekly_plan_response(plan_text, agent_type):
     Parse the AI response into a structured weekly plan format
     """
     
-    days_of_week = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']
+    days_of_week = tuple(day.upper() for day in _DAYS_OF_WEEK)
     
     # Initialize the plan structure
     parsed_plan = {
@@ -869,7 +1484,7 @@ def parse_weekly_plan_response(plan_text, agent_type):
     if len(parsed_plan['dailyPlans']) < 7:
         # Fill in missing days with fallbacks
         fallback_plans = get_fallback_daily_plans(agent_type)
-        for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']:
+        for day in _DAYS_OF_WEEK:
             if day not in parsed_plan['dailyPlans']:
                 parsed_plan['dailyPlans'][day] = fallback_plans.get(day, {
                     'exercises': ['Light activity as tolerated'],
@@ -1602,14 +2217,18 @@ def identify_food_from_image(image_path, analysis_type='food', fitness_goal='gen
             except Exception as e:
                 logging.warning(f"Could not get user food recommendations: {e}")
         
-        # Encode image to base64
-        with open(image_path, "rb") as image_file:
-            image_data = base64.b64encode(image_file.read()).decode('utf-8')
-        
-        # Determine the MIME type
-        mime_type, _ = guess_type(image_path)
-        if mime_type is None:
-            mime_type = 'image/jpeg'  # Default fallback
+        # Encode image to base64 (raw upload bytes skip the disk read)
+        if isinstance(image_path, (bytes, bytearray)):
+            image_data = base64.b64encode(image_path).decode('utf-8')
+            mime_type = 'image/jpeg'
+        else:
+            with open(image_path, "rb") as image_file:
+                image_data = base64.b64encode(image_file.read()).decode('utf-8')
+
+            # Determine the MIME type
+            mime_type, _ = guess_type(image_path)
+            if mime_type is None:
+                mime_type = 'image/jpeg'  # Default fallback
         
         if analysis_type == 'food':
             prompt = f"""
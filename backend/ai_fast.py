@@ -1,21 +1,33 @@
 import logging
-from openai import AzureOpenAI
 import os
-import base64
-from dotenv import load_dotenv
 
-load_dotenv()
+# Reuse ai.py's pooled client, model config, and encode cache instead of
+# duplicating the env reads and a second HTTP connection pool here
+from ai import client, model, _encode_image_cached
 
-# Azure OpenAI configuration
-azure_endpoint = os.getenv("AZURE_OPENAI_API_ENDPOINT")
-api_key = os.getenv("AZURE_OPENAI_API_KEY")
-api_version = os.getenv("AZURE_OPENAI_API_VERSION")
-model = os.getenv('AZURE_OPENAI_MODEL')
+AI_FAST_MAX_TOKENS = int(os.getenv("AI_FAST_MAX_TOKENS", "800"))
+AI_FAST_TEMPERATURE = float(os.getenv("AI_FAST_TEMPERATURE", "0.5"))
 
-client = AzureOpenAI(
-    api_key=api_key,
-    api_version=api_version,
-    azure_endpoint=azure_endpoint,
+# Optimized prompt guidance for specific agent types
+_AGENT_PROMPTS = {
+    "weight_loss": "Focus on cardio exercises and calorie deficit nutrition advice.",
+    "muscle_gain": "Emphasize strength training exercises and protein-rich nutrition.",
+    "cardio": "Prioritize cardiovascular exercises and endurance training.",
+    "strength": "Focus on compound movements and progressive overload.",
+    "general": "Provide balanced workout and nutrition recommendations."
+}
+
+# Invariant prompt text built once at import; only the user details,
+# guidance, and optional health note are substituted per call
+_FAST_PROMPT_TEMPLATE = (
+    "You are a fitness expert. %(user_info)s "
+    "%(specific_guidance)s\n\n"
+    "Provide:\n"
+    "1. **Quick Assessment** - what you see in the image\n"
+    "2. **3-Exercise Workout** - specific exercises with reps\n"
+    "3. **Nutrition Tip** - one key dietary advice\n"
+    "4. **Weekly Goal** - one achievable target\n\n"
+    "Keep it concise and actionable.%(health_note)s"
 )
 
 def get_fast_fitness_recommendation(image_paths, gender, age, weight, height=None, agent_type="general", health_conditions=""):
@@ -23,41 +35,23 @@ def get_fast_fitness_recommendation(image_paths, gender, age, weight, height=Non
     Fast fitness recommendation using only GPT-4o vision - no MCP overhead
     """
     try:
-        # Process images
-        encoded_images = []
-        for img_path in image_paths:
-            with open(img_path, "rb") as img_file:
-                encoded = base64.b64encode(img_file.read()).decode('utf-8')
-                encoded_images.append(encoded)
-
-        # Optimized prompt for specific agent types
-        agent_prompts = {
-            "weight_loss": "Focus on cardio exercises and calorie deficit nutrition advice.",
-            "muscle_gain": "Emphasize strength training exercises and protein-rich nutrition.",
-            "cardio": "Prioritize cardiovascular exercises and endurance training.",
-            "strength": "Focus on compound movements and progressive overload.",
-            "general": "Provide balanced workout and nutrition recommendations."
-        }
-        
-        specific_guidance = agent_prompts.get(agent_type, agent_prompts["general"])
+        # Process images through the shared encode cache
+        image_urls = [_encode_image_cached(img_path) for img_path in image_paths]
 
         user_info = f"Analyze this {gender}, {age} years old, {weight} lbs person's image."
         if height:
             user_info += f" They are {height} inches tall."
         if health_conditions.strip():
             user_info += f" Health/Exercise Notes: {health_conditions}"
+            health_note = ' IMPORTANT: Consider the health conditions/preferences mentioned above.'
+        else:
+            health_note = ''
 
-        prompt = (
-            f"You are a fitness expert. {user_info} "
-            f"{specific_guidance}\n\n"
-            f"Provide:\n"
-            f"1. **Quick Assessment** - what you see in the image\n"
-            f"2. **3-Exercise Workout** - specific exercises with reps\n"
-            f"3. **Nutrition Tip** - one key dietary advice\n"
-            f"4. **Weekly Goal** - one achievable target\n\n"
-            f"Keep it concise and actionable."
-            f"{' IMPORTANT: Consider the health conditions/preferences mentioned above.' if health_conditions.strip() else ''}"
-        )
+        prompt = _FAST_PROMPT_TEMPLATE % {
+            "user_info": user_info,
+            "specific_guidance": _AGENT_PROMPTS.get(agent_type, _AGENT_PROMPTS["general"]),
+            "health_note": health_note,
+        }
 
         # Make API call with optimized parameters
         response = client.chat.completions.create(
@@ -65,15 +59,15 @@ def get_fast_fitness_recommendation(image_paths, gender, age, weight, height=Non
             messages=[
                 {"role": "system", "content": prompt},
                 {"role": "user", "content": [
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded_images[0]}"}}
+                    {"type": "image_url", "image_url": {"url": image_urls[0]}}
                 ]}
             ],
-            max_tokens=int(os.getenv("AI_FAST_MAX_TOKENS", "800")),
-            temperature=float(os.getenv("AI_FAST_TEMPERATURE", "0.5")),
+            max_tokens=AI_FAST_MAX_TOKENS,
+            temperature=AI_FAST_TEMPERATURE,
         )
-        
+
         return response.choices[0].message.content
-        
+
     except Exception as e:
         logging.error(f"Fast fitness recommendation error: {e}")
         return f"Quick analysis complete! Based on your profile ({gender}, {age}, {weight} lbs), here's a starter plan: Try 3 sets of push-ups, squats, and planks. Focus on consistent daily movement and balanced nutrition. Start with 20 minutes of activity today!"
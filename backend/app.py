@@ -1,19 +1,61 @@
-from flask import Flask, Response, request, jsonify
+from flask import Flask, Request, Response, request, jsonify
 from flask_cors import CORS
 import cv2
+import atexit
+import io
+import json
 import os
-import uuid
+import shutil
 import logging
 import asyncio
+import threading
+from collections import OrderedDict, deque
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
-from ai import get_fitness_recommendation, identify_food_from_image, get_food_recommendations
+from ai import get_fitness_recommendation, get_fitness_recommendation_stream, identify_food_from_image, get_food_recommendations
 from ai_fast import get_fast_fitness_recommendation
 from mcp_client import (get_fitness_recommendation_mcp, get_fitness_recommendation_with_rag, 
                        get_fitness_recommendation_hybrid, get_fallback_fitness_recommendation)
 from voice_chat import voice_chat_bp, store_user_data_in_azure_search, store_weekly_plan_in_azure_search, store_food_recommendations_in_azure_search
 
 app = Flask(__name__)
+
+
+class _InMemoryUploadRequest(Request):
+    """Werkzeug spools uploads over 500 KB to a temp file before the handler
+    ever sees them. Every mode here either reads the bytes straight into the
+    vision pipeline or copies them out once, so keep multipart file parts in
+    RAM (bounded by MAX_CONTENT_LENGTH) and skip the disk round-trip."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+
+app.request_class = _InMemoryUploadRequest
+
+# Serialize JSON responses with orjson when available: long LLM
+# recommendation payloads dominate jsonify time, and orjson's C encoder
+# cuts that per-request CPU. Stdlib json remains the fallback.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    from flask.json.provider import JSONProvider
+
+    class OrjsonProvider(JSONProvider):
+        def dumps(self, obj, **kwargs):
+            # OPT_NON_STR_KEYS matches stdlib json's coercion of int keys
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
+
 # Update CORS to allow mobile device connections
 CORS(app, origins=[
     "http://localhost:3000",
@@ -28,6 +70,8 @@ CORS(app, origins=[
 # Initialize camera instance if needed for other parts, but not for frontend capture processing
 # camera = cv2.VideoCapture(0) 
 capture_folder = 'captured_images'
+# Path prefix precomputed once so the upload loop skips os.path.join
+_CAPTURE_PREFIX = os.path.join(capture_folder, '')
 
 # Register the voice chat blueprint
 app.register_blueprint(voice_chat_bp, url_prefix='/api')
@@ -42,37 +86,343 @@ if not os.path.exists(capture_folder):
     os.makedirs(capture_folder)
     logging.info(f"Created capture_folder: {capture_folder}")
 
+# Reject oversized uploads up front instead of buffering them through
+# werkzeug's temp-file machinery (default cap: 32 MB)
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_BYTES', str(32 * 1024 * 1024)))
+
+# Constant env flags, read once at import instead of on every request
+DISABLE_MCP = os.getenv("DISABLE_MCP", "false").lower() == "true"
+DEBUG_PERSIST_UPLOADS = os.getenv("DEBUG_PERSIST_UPLOADS", "false").lower() == "true"
+VIDEO_FEED_JPEG_QUALITY = int(os.getenv("VIDEO_FEED_JPEG_QUALITY", "70"))
+
+# The AI helpers signal failure by returning their canned fallback text;
+# both messages are fixed prefixes, so startswith avoids scanning (and
+# lowercasing) multi-KB recommendation bodies on every request
+_AI_ERROR_PREFIX = "An error occurred"
+_FAST_FALLBACK_PREFIX = "Quick analysis complete!"
+
+# Truthy form values; set membership beats allocating a lowercase copy
+_TRUTHY = frozenset({'true', '1', 'yes', 'on', 'True', 'TRUE'})
+
+# Bounded in-process memo for repeat requests with byte-identical inputs
+# (retries, debugging, stable profiles). sha256 over multi-MB JPEGs is
+# cheap (SHA-NI via OpenSSL); the LLM call it skips is seconds.
+_REC_CACHE = OrderedDict()
+_REC_CACHE_MAX = 512
+_REC_CACHE_LOCK = threading.Lock()
+
+
+def _rec_cache_get(key):
+    with _REC_CACHE_LOCK:
+        value = _REC_CACHE.get(key)
+        if value is not None:
+            _REC_CACHE.move_to_end(key)
+        return value
+
+
+def _rec_cache_put(key, value):
+    with _REC_CACHE_LOCK:
+        _REC_CACHE[key] = value
+        _REC_CACHE.move_to_end(key)
+        while len(_REC_CACHE) > _REC_CACHE_MAX:
+            _REC_CACHE.popitem(last=False)
+
+
+# One long-lived event loop on a daemon thread: asyncio.run would build
+# and tear down a loop (plus the HTTP sessions the MCP/RAG coroutines
+# cache on it) for every request
+_async_loop = asyncio.new_event_loop()
+threading.Thread(target=_async_loop.run_forever, name='async-loop', daemon=True).start()
+
+
+def _run_async(coro):
+    """Run a coroutine on the shared loop and block for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _async_loop).result()
+
+
+# Azure Search persistence is fire-and-forget from the client's point of
+# view, so it runs on this pool after the response is already on the wire
+_bg_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='store')
+atexit.register(_bg_executor.shutdown)
+
+
+def _log_store_result(label, user_email):
+    def _callback(future):
+        try:
+            if future.result():
+                logging.info(f"Successfully stored {label} in Azure Search for {user_email}")
+            else:
+                logging.warning(f"Failed to store {label} in Azure Search for {user_email}")
+        except Exception as e:
+            logging.error(f"Error storing {label} in Azure Search: {e}")
+    return _callback
+
+
+def _persist_images(images):
+    """Write any in-memory images to capture_folder so path-based pipelines
+    (the MCP/RAG fallbacks) can consume them; paths pass through as-is."""
+    paths = []
+    for image in images:
+        if isinstance(image, (bytes, bytearray)):
+            img_path = f"{_CAPTURE_PREFIX}{os.urandom(8).hex()}.jpg"
+            with open(img_path, 'wb') as f:
+                f.write(image)
+            paths.append(img_path)
+        else:
+            paths.append(image)
+    return paths
+
+
+# Shared server camera: opening /dev/video0 costs hundreds of ms of
+# probing, and two concurrent opens collide with EBUSY, so the device is
+# opened once on first use and released at exit. A single producer thread
+# reads and encodes frames into a one-slot buffer; consumers only ever see
+# the freshest encoded frame, so a slow client never stalls the capture
+# or forces re-encoding of stale frames.
+_CAMERA = None
+_CAMERA_LOCK = threading.Lock()
+_FRAME_BUF = deque(maxlen=1)
+_FRAME_EVT = threading.Event()
+
+
+def _camera_producer(camera, encode_params):
+    while camera.isOpened():
+        success, frame = camera.read()
+        if not success:
+            logging.warning("Failed to read frame from server camera for video_feed.")
+            break
+        ret, buffer = cv2.imencode('.jpg', frame, encode_params)
+        if not ret:
+            logging.warning("Failed to encode frame for video_feed.")
+            continue
+        _FRAME_BUF.append(buffer.tobytes())
+        _FRAME_EVT.set()
+
+
+def _get_camera():
+    global _CAMERA
+    with _CAMERA_LOCK:
+        if _CAMERA is None or not _CAMERA.isOpened():
+            camera = cv2.VideoCapture(0)
+            if not camera.isOpened():
+                return None
+            # Keep at most one frame queued in the driver so slow consumers
+            # always get the freshest frame instead of a stale backlog
+            camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            _CAMERA = camera
+            atexit.register(camera.release)
+            # Quality 70 roughly halves encode CPU and frame bytes vs the
+            # default 95 with no visible difference in a preview stream;
+            # skipping the optimize pass keeps the encoder on its fast path
+            encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), VIDEO_FEED_JPEG_QUALITY,
+                             int(cv2.IMWRITE_JPEG_OPTIMIZE), 0]
+            threading.Thread(target=_camera_producer, args=(camera, encode_params),
+                             name='camera-producer', daemon=True).start()
+    return _CAMERA
+
+
+# Magic-byte prefixes for the formats the vision pipeline accepts;
+# sniffing 16 bytes up front beats paying the save + decode cost for a
+# mislabeled or malicious upload
+class _InvalidUpload(ValueError):
+    """Raised when an upload fails the magic-byte sniff"""
+
+
+_IMAGE_MAGICS = (b'\xff\xd8\xff', b'\x89PNG')
+
+
+def _looks_like_image(head):
+    return head.startswith(_IMAGE_MAGICS) or (head[:4] == b'RIFF' and head[8:12] == b'WEBP')
+
+
+def _normalize_result(result):
+    """Collapse the mode-specific return shapes (plain string, RAG/MCP/Hybrid
+    dicts) into the string the frontend expects, with one type check."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, dict):
+        if 'recommendation' in result:
+            return result['recommendation']
+        if 'error' in result:
+            return result.get('error', 'An error occurred during processing')
+        return f"Processed your request successfully. Here are your results:\n\n{result}"
+    return str(result)
+
+
+def _save_upload(file_storage, img_path):
+    """Persist an upload with a 1 MB buffered copy, or os.sendfile when the
+    incoming stream is backed by a real file descriptor, instead of
+    werkzeug's default small-buffer save."""
+    upload_stream = file_storage.stream
+    with open(img_path, 'wb') as dst:
+        src_fd = None
+        if hasattr(os, 'sendfile'):
+            try:
+                src_fd = upload_stream.fileno()
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                src_fd = None
+        if src_fd is not None:
+            offset = 0
+            remaining = os.fstat(src_fd).st_size
+            while remaining > 0:
+                sent = os.sendfile(dst.fileno(), src_fd, offset, remaining)
+                if not sent:
+                    break
+                offset += sent
+                remaining -= sent
+        else:
+            shutil.copyfileobj(upload_stream, dst, length=1024 * 1024)
+        # Uploads are write-once and re-read shortly (if at all) by the
+        # vision path; tell the kernel not to keep the pages cached
+        if hasattr(os, 'posix_fadvise'):
+            dst.flush()
+            os.posix_fadvise(dst.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy"}), 200
 
+# Mode handlers for /api/fitness_recommendation, dispatched through
+# _MODE_HANDLERS below instead of a per-request if/elif ladder. Each takes
+# the shared profile dict and the ingested images.
+
+def _run_mode_disabled(user_data, images):
+    # MCP is disabled, use enhanced fallback with Agentic RAG
+    logging.info("MCP disabled, using enhanced fallback with Agentic RAG")
+    return get_fallback_fitness_recommendation(user_data, images)
+
+
+def _run_mode_hybrid(user_data, images):
+    # Use Hybrid RAG + MCP for ultimate recommendations
+    logging.info("Using Hybrid RAG + MCP mode for comprehensive recommendation")
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("🖼️ Images being passed to hybrid function: %s (count: %d)", images, len(images))
+        for i, img_path in enumerate(images):
+            logging.debug("  Image %d: %s (exists: %s)", i + 1, img_path, os.path.exists(img_path))
+    return _run_async(get_fitness_recommendation_hybrid(images, user_data))
+
+
+def _run_mode_rag(user_data, images):
+    # Use Azure AI Search RAG for enhanced recommendations
+    logging.info("Using Azure AI Search RAG mode for recommendation")
+    return _run_async(get_fitness_recommendation_with_rag(images, user_data))
+
+
+def _run_mode_mcp(user_data, images):
+    # Use MCP (Model Context Protocol) for structured recommendations
+    logging.info("Using MCP mode for recommendation")
+    return _run_async(get_fitness_recommendation_mcp(
+        images, user_data['gender'], user_data['age'], user_data['weight'],
+        user_data['height'], user_data['agent_type'], user_data['health_conditions']))
+
+
+def _run_mode_fast(user_data, images):
+    # Use fast mode for quicker responses
+    result = get_fast_fitness_recommendation(
+        images, user_data['gender'], user_data['age'], user_data['weight'],
+        user_data['height'], user_data['agent_type'], user_data['health_conditions'])
+    logging.info("Using fast mode for recommendation")
+
+    # Check if fast mode failed and fallback to enhanced RAG
+    if isinstance(result, str) and result.startswith((_FAST_FALLBACK_PREFIX, _AI_ERROR_PREFIX)):
+        logging.info("Fast mode failed, falling back to enhanced RAG system")
+        result = get_fallback_fitness_recommendation(user_data, _persist_images(images))
+    return result
+
+
+def _run_mode_standard(user_data, images):
+    # Use standard enhanced mode; memoize on exact image bytes + profile
+    # (images are in-memory bytes in this mode)
+    hasher = hashlib.sha256()
+    for image in images:
+        hasher.update(image if isinstance(image, (bytes, bytearray)) else image.encode())
+    cache_key = ('rec', hasher.hexdigest(), user_data['gender'], user_data['age'],
+                 user_data['weight'], user_data['height'], user_data['agent_type'],
+                 user_data['health_conditions'])
+    result = _rec_cache_get(cache_key)
+    if result is not None:
+        logging.info("Returning memoized recommendation for identical request")
+        return result
+    result = get_fitness_recommendation(
+        images, user_data['gender'], user_data['age'], user_data['weight'],
+        user_data['height'], user_data['agent_type'], user_data['health_conditions'])
+    logging.info("Using enhanced mode for recommendation")
+    if isinstance(result, str) and not result.startswith(_AI_ERROR_PREFIX):
+        _rec_cache_put(cache_key, result)
+
+    # Check if enhanced mode failed and fallback to enhanced RAG
+    if isinstance(result, str) and result.startswith(_AI_ERROR_PREFIX):
+        logging.info("Enhanced mode failed, falling back to enhanced RAG system")
+        result = get_fallback_fitness_recommendation(user_data, _persist_images(images))
+    return result
+
+
+_MODE_HANDLERS = {
+    'disabled': _run_mode_disabled,
+    'hybrid': _run_mode_hybrid,
+    'rag': _run_mode_rag,
+    'mcp': _run_mode_mcp,
+    'fast': _run_mode_fast,
+    'standard': _run_mode_standard,
+}
+
+
+def _select_mode(use_hybrid, use_rag, use_mcp, fast_mode):
+    if DISABLE_MCP:
+        return 'disabled'
+    if use_hybrid or (use_rag and use_mcp):
+        return 'hybrid'
+    if use_rag:
+        return 'rag'
+    if use_mcp:
+        return 'mcp'
+    if fast_mode:
+        return 'fast'
+    return 'standard'
+
+
 @app.route('/api/fitness_recommendation', methods=['POST'])
 def fitness_recommendation():
     logging.info("--- Fitness Recommendation Endpoint Hit ---")
-    logging.debug(f"Request.method: {request.method}")
-    logging.debug(f"Request.headers: {request.headers}")
-    logging.debug(f"Request.files: {request.files}")
-    logging.debug(f"Request.form: {request.form}")
+    # %-style args defer the (potentially multi-MB) multipart stringification
+    # to the handler, so it only happens when debug logging is actually on
+    logging.debug("Request.method: %s", request.method)
+    logging.debug("Request.headers: %r", request.headers)
+    logging.debug("Request.files: %r", request.files)
+    logging.debug("Request.form: %r", request.form)
 
-    gender = request.form.get('gender')
-    age = request.form.get('age')
-    weight = request.form.get('weight')
-    height = request.form.get('height')
-    health_conditions = request.form.get('health_conditions', '')  # Optional field
-    agent_type = request.form.get('agent_type', 'general')  # Default to 'general' if not provided
-    user_email = request.form.get('user_email', '')  # User email for storing in Azure Search
-    fast_mode = request.form.get('fast_mode', 'false').lower() == 'true'  # Check for fast mode
-    use_rag = request.form.get('use_rag', 'false').lower() == 'true'  # Check for RAG mode
-    use_mcp = request.form.get('use_mcp', 'false').lower() == 'true'  # Check for MCP mode
-    use_hybrid = request.form.get('use_hybrid', 'false').lower() == 'true'  # Check for Hybrid mode
+    # Snapshot the multipart form once; each request.form.get goes through
+    # MultiDict normalization, so read from a plain dict instead
+    form = request.form.to_dict()
+    get = form.get
+    gender = get('gender')
+    age = get('age')
+    weight = get('weight')
+    height = get('height')
+    health_conditions = get('health_conditions', '')  # Optional field
+    agent_type = get('agent_type', 'general')  # Default to 'general' if not provided
+    user_email = get('user_email', '')  # User email for storing in Azure Search
+    fast_mode = get('fast_mode') in _TRUTHY  # Check for fast mode
+    use_rag = get('use_rag') in _TRUTHY  # Check for RAG mode
+    use_mcp = get('use_mcp') in _TRUTHY  # Check for MCP mode
+    use_hybrid = get('use_hybrid') in _TRUTHY  # Check for Hybrid mode
     
     # Debug height value
-    logging.info(f"Height value received: '{height}' (type: {type(height)}, length: {len(height) if height else 'None'})")
+    logging.debug("Height value received: '%s' (type: %s)", height, type(height))
     
-    logging.info(f"Received user data: Gender={gender}, Age={age}, Weight={weight}, Height={height}, HealthConditions={health_conditions}, Agent={agent_type}, FastMode={fast_mode}, UseRAG={use_rag}, UseMCP={use_mcp}, UseHybrid={use_hybrid}")
+    logging.info("Received user data: Gender=%s, Age=%s, Weight=%s, Height=%s, HealthConditions=%s, Agent=%s, FastMode=%s, UseRAG=%s, UseMCP=%s, UseHybrid=%s",
+                 gender, age, weight, height, health_conditions, agent_type, fast_mode, use_rag, use_mcp, use_hybrid)
 
     images = []
-    
+
+    # The plain vision paths (standard and fast mode) work on in-memory
+    # bytes, so skip the write-then-reread through capture_folder for them;
+    # the MCP/RAG/hybrid pipelines still consume file paths, and
+    # DEBUG_PERSIST_UPLOADS forces everything to disk for inspection.
+    keep_in_memory = not (use_rag or use_mcp or use_hybrid or
+                          DISABLE_MCP or
+                          DEBUG_PERSIST_UPLOADS)
+
     if 'images' in request.files:
         files = request.files.getlist('images')
         
@@ -80,30 +430,47 @@ def fitness_recommendation():
             logging.warning("Key 'images' in request.files but getlist('images') is empty or files have no names.")
             return jsonify({'error': 'No image files found or files are invalid.'}), 400
 
-        logging.info(f"Found {len(files)} file(s) in request.files['images']")
+        logging.info("Found %d file(s) in request.files['images']", len(files))
 
+        def _ingest_one(file_storage):
+            """Read (in-memory modes) or save (path-based modes) one upload"""
+            head = file_storage.stream.read(16)
+            file_storage.stream.seek(0)
+            if not _looks_like_image(head):
+                raise _InvalidUpload(f"'{file_storage.filename}' is not a supported image (JPEG/PNG/WEBP)")
+            if keep_in_memory:
+                return file_storage.read()
+            original_filename = file_storage.filename
+            # Sanitize filename and create a unique path
+            # Using a simple UUID for the main part of the filename for simplicity and uniqueness
+            dot = original_filename.rfind('.')
+            # Ensure there's an extension, default to .jpg if not
+            extension = original_filename[dot:] if dot > 0 else '.jpg'
+            img_path = f"{_CAPTURE_PREFIX}{os.urandom(8).hex()}{extension}"
+            _save_upload(file_storage, img_path)
+            logging.info("Successfully saved image ('%s') to %s", original_filename, img_path)
+            return img_path
+
+        valid_files = []
         for i, file_storage in enumerate(files):
             if file_storage and file_storage.filename:
-                original_filename = file_storage.filename
-                # Sanitize filename and create a unique path
-                # Using a simple UUID for the main part of the filename for simplicity and uniqueness
-                safe_filename_base = str(uuid.uuid4())
-                _, extension = os.path.splitext(original_filename)
-                if not extension: # Ensure there's an extension, default to .jpg if not
-                    extension = '.jpg'
-                
-                safe_filename = f"{safe_filename_base}{extension}"
-                img_path = os.path.join(capture_folder, safe_filename)
-                
-                try:
-                    file_storage.save(img_path)
-                    logging.info(f"Successfully saved image {i+1} ('{original_filename}') to {img_path}")
-                    images.append(img_path)
-                except Exception as e:
-                    logging.error(f"Failed to save image '{original_filename}' to {img_path}: {e}")
-                    return jsonify({'error': f'Failed to save image: {original_filename}. Error: {str(e)}'}), 500
+                valid_files.append(file_storage)
             else:
                 logging.warning(f"File {i+1} in request.files['images'] is invalid (no file_storage or no filename). Skipping.")
+
+        try:
+            # Multi-photo requests ingest concurrently; results keep order
+            if len(valid_files) > 1:
+                with ThreadPoolExecutor(max_workers=min(8, len(valid_files))) as executor:
+                    images = list(executor.map(_ingest_one, valid_files))
+            else:
+                images = [_ingest_one(f) for f in valid_files]
+        except _InvalidUpload as e:
+            logging.warning(f"Rejected upload: {e}")
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logging.error(f"Failed to process uploaded images: {e}")
+            return jsonify({'error': f'Failed to process uploaded images. Error: {str(e)}'}), 500
     
     # This elif block for server-side camera capture is likely not what's being used by your frontend's capture.
     # The frontend sends the captured image as a file upload.
@@ -117,112 +484,29 @@ def fitness_recommendation():
         logging.error("No images were successfully processed and saved from the request. 'images' key might be missing or all files failed processing.")
         return jsonify({'error': 'No valid image files were provided or an error occurred while saving images.'}), 400
 
-    logging.info(f"Processing {len(images)} image(s): {images}")
+    logging.info("Processing %d image(s)", len(images))
     
     # Check if MCP is disabled in environment
-    disable_mcp = os.getenv("DISABLE_MCP", "false").lower() == "true"
     
+    # All fallback/RAG paths take the same profile dict; build it once
+    user_data = {
+        'gender': gender,
+        'age': age,
+        'weight': weight,
+        'height': height,
+        'health_conditions': health_conditions,
+        'agent_type': agent_type
+    }
+
     try:
-        # Determine which AI processing mode to use
-        if disable_mcp:
-            # MCP is disabled, use enhanced fallback with Agentic RAG
-            logging.info("MCP disabled, using enhanced fallback with Agentic RAG")
-            user_data = {
-                'gender': gender,
-                'age': age,
-                'weight': weight,
-                'height': height,
-                'health_conditions': health_conditions,
-                'agent_type': agent_type
-            }
-            result = get_fallback_fitness_recommendation(user_data, images)
-        elif use_hybrid or (use_rag and use_mcp):
-            # Use Hybrid RAG + MCP for ultimate recommendations
-            logging.info("Using Hybrid RAG + MCP mode for comprehensive recommendation")
-            logging.info(f"🖼️ Images being passed to hybrid function: {images} (count: {len(images)})")
-            for i, img_path in enumerate(images):
-                logging.info(f"  Image {i+1}: {img_path} (exists: {os.path.exists(img_path)})")
-            user_data = {
-                'gender': gender,
-                'age': age,
-                'weight': weight,
-                'height': height,
-                'health_conditions': health_conditions,
-                'agent_type': agent_type
-            }
-            result = asyncio.run(get_fitness_recommendation_hybrid(images, user_data))
-        elif use_rag:
-            # Use Azure AI Search RAG for enhanced recommendations
-            logging.info("Using Azure AI Search RAG mode for recommendation")
-            user_data = {
-                'gender': gender,
-                'age': age,
-                'weight': weight,
-                'height': height,
-                'health_conditions': health_conditions,
-                'agent_type': agent_type
-            }
-            result = asyncio.run(get_fitness_recommendation_with_rag(images, user_data))
-        elif use_mcp:
-            # Use MCP (Model Context Protocol) for structured recommendations
-            logging.info("Using MCP mode for recommendation")
-            result = asyncio.run(get_fitness_recommendation_mcp(images, gender, age, weight, height, agent_type, health_conditions))
-        elif fast_mode:
-            # Use fast mode for quicker responses
-            result = get_fast_fitness_recommendation(images, gender, age, weight, height, agent_type, health_conditions)
-            logging.info("Using fast mode for recommendation")
-            
-            # Check if fast mode failed and fallback to enhanced RAG
-            if isinstance(result, str) and ("Quick analysis complete!" in result or "error" in result.lower()):
-                logging.info("Fast mode failed, falling back to enhanced RAG system")
-                user_data = {
-                    'gender': gender,
-                    'age': age,
-                    'weight': weight,
-                    'height': height,
-                    'health_conditions': health_conditions,
-                    'agent_type': agent_type
-                }
-                result = get_fallback_fitness_recommendation(user_data, images)
-        else:
-            # Use standard enhanced mode
-            result = get_fitness_recommendation(images, gender, age, weight, height, agent_type, health_conditions)
-            logging.info("Using enhanced mode for recommendation")
-            
-            # Check if enhanced mode failed and fallback to enhanced RAG
-            if isinstance(result, str) and "An error occurred" in result:
-                logging.info("Enhanced mode failed, falling back to enhanced RAG system")
-                user_data = {
-                    'gender': gender,
-                    'age': age,
-                    'weight': weight,
-                    'height': height,
-                    'health_conditions': health_conditions,
-                    'agent_type': agent_type
-                }
-                result = get_fallback_fitness_recommendation(user_data, images)
-            
+        mode = _select_mode(use_hybrid, use_rag, use_mcp, fast_mode)
+        result = _MODE_HANDLERS[mode](user_data, images)
+
         # ai.py's get_fitness_recommendation returns a string "An error occurred..." on its internal errors.
         # This is currently returned as part of a 200 OK.
+        recommendation_text = _normalize_result(result)
         
-        # Handle different result types from various processing modes
-        recommendation_text = result
-        
-        # Extract string recommendation from complex objects (RAG/MCP/Hybrid modes)
-        if isinstance(result, dict):
-            if 'recommendation' in result:
-                recommendation_text = result['recommendation']
-            elif 'error' in result:
-                recommendation_text = result.get('error', 'An error occurred during processing')
-            else:
-                # Convert complex object to readable string
-                recommendation_text = f"Processed your request successfully. Here are your results:\n\n{str(result)}"
-        
-        # Ensure we always have a string for the frontend
-        if not isinstance(recommendation_text, str):
-            recommendation_text = str(recommendation_text)
-        
-        if isinstance(recommendation_text, str) and "An error occurred" in recommendation_text:
+        if recommendation_text.startswith(_AI_ERROR_PREFIX):
             logging.warning(f"AI processing indicated an error: {recommendation_text}")
             # If you want this to be a server error that triggers frontend's catch:
             # return jsonify({'error': recommendation_text, 'source': 'ai_processing'}), 500
@@ -230,6 +514,7 @@ def fitness_recommendation():
         # Store user profile and recommendations in Azure Search if user_email is provided
         if user_email and user_email.strip():
             try:
+                now = datetime.now().isoformat() + 'Z'
                 user_profile = {
                     'email': user_email,
                     'name': user_email.split('@')[0],  # Use email prefix as name if no name provided
@@ -240,37 +525,71 @@ def fitness_recommendation():
                     'fitnessLevel': 'beginner',  # Default value
                     'agentType': agent_type,
                     'medicalConditions': [health_conditions] if health_conditions else [],
-                    'createdAt': datetime.now().isoformat() + 'Z',
+                    'createdAt': now,
                     'isActive': True,
-                    'lastLoginAt': datetime.now().isoformat() + 'Z'
+                    'lastLoginAt': now
                 }
                 
-                # Store the profile and recommendation in Azure Search
-                success = store_user_data_in_azure_search(
+                # Store the profile and recommendation in Azure Search in the
+                # background; the client doesn't need the storage ACK
+                _bg_executor.submit(
+                    store_user_data_in_azure_search,
                     user_email=user_email,
                     user_profile=user_profile,
                     progress_data=[],  # No progress data from web interface
                     recommendations=[{
                         'content': recommendation_text,
-                        'timestamp': datetime.now().isoformat() + 'Z',
+                        'timestamp': now,
                         'agent_type': agent_type
                     }]
-                )
-                
-                if success:
-                    logging.info(f"Successfully stored user data in Azure Search for {user_email}")
-                else:
-                    logging.warning(f"Failed to store user data in Azure Search for {user_email}")
-                    
+                ).add_done_callback(_log_store_result('user data', user_email))
             except Exception as e:
                 logging.error(f"Error storing user data in Azure Search: {e}")
         
-        logging.info(f"Recommendation result: {recommendation_text}")
+        # Full response bodies are multi-KB; only dump them when debugging
+        logging.debug("Recommendation result: %s", recommendation_text)
         return jsonify({'recommendation': recommendation_text})
     except Exception as e:
         logging.error(f"Unexpected error during recommendation generation: {e}", exc_info=True)
         return jsonify({'error': 'An internal server error occurred while generating recommendations.'}), 500
 
+@app.route('/api/fitness_recommendation/stream', methods=['POST'])
+def fitness_recommendation_stream():
+    """Stream the vision analysis over SSE so the browser can render tokens
+    as they are generated instead of waiting for the full completion."""
+    gender = request.form.get('gender')
+    age = request.form.get('age')
+    weight = request.form.get('weight')
+    height = request.form.get('height')
+    health_conditions = request.form.get('health_conditions', '')
+    agent_type = request.form.get('agent_type', 'general')
+
+    images = []
+    if 'images' in request.files:
+        for file_storage in request.files.getlist('images'):
+            if file_storage and file_storage.filename:
+                dot = file_storage.filename.rfind('.')
+                extension = file_storage.filename[dot:] if dot > 0 else '.jpg'
+                img_path = f"{_CAPTURE_PREFIX}{os.urandom(8).hex()}{extension}"
+                try:
+                    _save_upload(file_storage, img_path)
+                    images.append(img_path)
+                except Exception as e:
+                    logging.error(f"Failed to save image '{file_storage.filename}': {e}")
+                    return jsonify({'error': f'Failed to save image: {file_storage.filename}'}), 500
+
+    if not images:
+        return jsonify({'error': 'No valid image files were provided.'}), 400
+
+    def generate():
+        # Deltas are JSON-encoded so newlines inside them survive SSE framing
+        for delta in get_fitness_recommendation_stream(
+                images, gender, age, weight, height, agent_type, health_conditions):
+            yield f"data: {json.dumps(delta)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return Response(generate(), mimetype='text/event-stream')
+
 @app.route('/api/get-weekly-plan', methods=['GET'])
 def get_weekly_plan():
     """Get the latest weekly plan for a user from Azure Search"""
@@ -328,13 +647,9 @@ def generate_weekly_plan():
         user_email = user_profile.get('email')
         if user_email and user_email.strip():
             try:
-                success = store_weekly_plan_in_azure_search(user_email, weekly_plan)
-                
-                if success:
-                    logging.info(f"Successfully stored weekly plan in Azure Search for {user_email}")
-                else:
-                    logging.warning(f"Failed to store weekly plan in Azure Search for {user_email}")
-                    
+                _bg_executor.submit(
+                    store_weekly_plan_in_azure_search, user_email, weekly_plan
+                ).add_done_callback(_log_store_result('weekly plan', user_email))
             except Exception as e:
                 logging.error(f"Error storing weekly plan in Azure Search: {e}")
         
@@ -350,14 +665,15 @@ def food_recommendations():
     logging.info("--- Food Recommendations Endpoint Hit ---")
     
     try:
-        user_email = request.form.get('user_email', '')
-        gender = request.form.get('gender')
-        age = request.form.get('age')
-        weight = request.form.get('weight')
-        height = request.form.get('height')
-        fitness_goal = request.form.get('fitness_goal', 'general')  # weight_loss, muscle_gain, maintenance
-        dietary_restrictions = request.form.get('dietary_restrictions', '')
-        meal_preferences = request.form.get('meal_preferences', '')  # vegetarian, vegan, keto, etc.
+        form = request.form.to_dict()
+        user_email = form.get('user_email', '')
+        gender = form.get('gender')
+        age = form.get('age')
+        weight = form.get('weight')
+        height = form.get('height')
+        fitness_goal = form.get('fitness_goal', 'general')  # weight_loss, muscle_gain, maintenance
+        dietary_restrictions = form.get('dietary_restrictions', '')
+        meal_preferences = form.get('meal_preferences', '')  # vegetarian, vegan, keto, etc.
         
         if not all([gender, age, weight, height]):
             return jsonify({
@@ -365,21 +681,28 @@ def food_recommendations():
             }), 400
         
         # Get food recommendations
-        food_recommendations = get_food_recommendations(
-            gender=gender,
-            age=int(age),
-            weight=float(weight),
-            height=float(height),
-            fitness_goal=fitness_goal,
-            dietary_restrictions=dietary_restrictions,
-            meal_preferences=meal_preferences,
-            user_email=user_email
-        )
+        cache_key = ('food', gender, age, weight, height, fitness_goal,
+                     dietary_restrictions, meal_preferences)
+        food_recommendations = _rec_cache_get(cache_key)
+        if food_recommendations is None:
+            food_recommendations = get_food_recommendations(
+                gender=gender,
+                age=int(age),
+                weight=float(weight),
+                height=float(height),
+                fitness_goal=fitness_goal,
+                dietary_restrictions=dietary_restrictions,
+                meal_preferences=meal_preferences,
+                user_email=user_email
+            )
+            if food_recommendations:
+                _rec_cache_put(cache_key, food_recommendations)
         
         # Store food recommendations in Azure Search if user email provided
         if user_email and food_recommendations:
             try:
-                store_food_recommendations_in_azure_search(
+                _bg_executor.submit(
+                    store_food_recommendations_in_azure_search,
                     user_email=user_email,
                     recommendations_data={
                         "gender": gender,
@@ -392,8 +715,7 @@ def food_recommendations():
                         "recommendations": food_recommendations,
                         "created_at": datetime.now().isoformat()
                     }
-                )
-                logging.info(f"Stored food recommendations for user: {user_email}")
+                ).add_done_callback(_log_store_result('food recommendations', user_email))
             except Exception as storage_error:
                 logging.error(f"Failed to store food recommendations: {storage_error}")
         
@@ -428,26 +750,25 @@ def identify_food():
         dietary_restrictions = request.form.get('dietary_restrictions', '')
         analysis_type = request.form.get('analysis_type', 'food')  # 'food' or 'ingredient'
         
-        # Save the uploaded image temporarily
-        image_filename = f"food_identification_{uuid.uuid4()}.jpg"
-        image_path = os.path.join(capture_folder, image_filename)
-        image_file.save(image_path)
-        
+        # Hand the upload bytes straight to the analyzer; only persist a
+        # copy when DEBUG_PERSIST_UPLOADS asks for it
+        image_bytes = image_file.read()
+        if not _looks_like_image(image_bytes[:16]):
+            return jsonify({'error': 'Unsupported image format; JPEG, PNG, or WEBP required'}), 400
+        if DEBUG_PERSIST_UPLOADS:
+            debug_path = f"{_CAPTURE_PREFIX}food_identification_{os.urandom(8).hex()}.jpg"
+            with open(debug_path, 'wb') as f:
+                f.write(image_bytes)
+
         # Identify the food/ingredient and get analysis or recipes
         food_analysis = identify_food_from_image(
-            image_path=image_path,
+            image_path=image_bytes,
             analysis_type=analysis_type,
             fitness_goal=fitness_goal,
             dietary_restrictions=dietary_restrictions,
             user_email=user_email
         )
         
-        # Clean up the temporary image file
-        try:
-            os.remove(image_path)
-        except Exception as cleanup_error:
-            logging.warning(f"Failed to cleanup temporary image: {cleanup_error}")
-        
         return jsonify({
             "success": True,
             "analysis_type": analysis_type,
@@ -463,28 +784,52 @@ def identify_food():
 @app.route('/video_feed')
 def video_feed():
     # This is for streaming server's camera, not directly related to frontend capture processing
-    camera_device = cv2.VideoCapture(0) # Ensure camera is initialized here if used
+    camera_device = _get_camera()
+    if camera_device is None:
+        return jsonify({'error': 'Server camera is not available.'}), 503
     def gen_frames():
-        while True:
-            success, frame = camera_device.read() # Use the local camera_device
-            if not success:
-                logging.warning("Failed to read frame from server camera for video_feed.")
+        while camera_device.isOpened():
+            # Wait for the producer to publish a fresh frame; every
+            # concurrent stream shares the same encoded bytes
+            if not _FRAME_EVT.wait(timeout=5.0):
+                logging.warning("Timed out waiting for a camera frame in video_feed.")
                 break
-            else:
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if not ret:
-                    logging.warning("Failed to encode frame for video_feed.")
-                    continue
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        camera_device.release() # Release camera when done
+            _FRAME_EVT.clear()
+            try:
+                frame_bytes = _FRAME_BUF[-1]
+            except IndexError:
+                continue
+            # Single bytes object per frame -> one send() per frame
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
     return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+def _warmup():
+    """Touch the lazily-built handles off the request path so the first
+    request doesn't pay for index creation and client construction. The
+    Azure OpenAI/Search clients in ai.py are already built at import."""
+    try:
+        from ai import ensure_index
+        ensure_index()
+    except Exception as e:
+        logging.warning(f"Warmup: semantic cache index not ready: {e}")
+    try:
+        from mcp_client import get_shared_client
+        get_shared_client()
+    except Exception as e:
+        logging.warning(f"Warmup: shared MCP client init failed: {e}")
+
+
+threading.Thread(target=_warmup, name='warmup', daemon=True).start()
+
+
 if __name__ == '__main__':
+    # Dev entry point only. Production runs under gunicorn
+    # (gunicorn -c gunicorn.conf.py app:app), whose gevent workers overlap
+    # the network-bound LLM latency; the Werkzeug dev server serializes it.
     # For more detailed Flask logs, especially if not using app.debug=True in production
     # handler = logging.StreamHandler()
     # handler.setLevel(logging.DEBUG)
     # app.logger.addHandler(handler)
     # app.logger.setLevel(logging.DEBUG)
-    app.run(debug=True)
+    app.run(debug=os.getenv('FLASK_ENV', 'development') == 'development')
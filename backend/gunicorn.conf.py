@@ -0,0 +1,19 @@
+"""Gunicorn configuration for the Flask backend.
+
+Run with: gunicorn -c gunicorn.conf.py app:app
+
+The workload is I/O-bound (Azure OpenAI and AI Search round-trips), so
+gevent workers let each process keep many requests in flight instead of
+queuing them behind a single LLM call the way the Werkzeug dev server
+does. The long default timeout covers worst-case vision generations.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+workers = int(os.getenv("GUNICORN_WORKERS", str(min(4, multiprocessing.cpu_count()))))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = 5
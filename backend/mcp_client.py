@@ -4,9 +4,11 @@ Keeps only the functions actually used by the application
 """
 
 import os
-import json
 import asyncio
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 from dotenv import load_dotenv
 
@@ -15,6 +17,10 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Constant env flags, parsed once at import (they don't change at runtime)
+DISABLE_MCP = os.getenv("DISABLE_MCP", "false").lower() == "true"
+ENABLE_AGENTIC_RAG = os.getenv("ENABLE_AGENTIC_RAG", "false").lower() == "true"
+
 # Check if Azure Search is available
 AZURE_SEARCH_AVAILABLE = False
 try:
@@ -67,48 +73,120 @@ class FitnessMCPClient:
             return None
 
 
+# The exercise and benchmark queries depend only on coarse profile
+# fields (goal, age bucket, gender) and the index changes rarely, so an
+# hour-long TTL cache turns most fallback recommendations into zero
+# Search round-trips
+_SEARCH_CACHE = {}
+_SEARCH_CACHE_LOCK = threading.Lock()
+_SEARCH_CACHE_TTL = 3600.0
+_SEARCH_CACHE_MAX = 256
+
+
+def _search_cache_get(key):
+    with _SEARCH_CACHE_LOCK:
+        entry = _SEARCH_CACHE.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > _SEARCH_CACHE_TTL:
+            del _SEARCH_CACHE[key]
+            return None
+        return value
+
+
+def _search_cache_put(key, value):
+    with _SEARCH_CACHE_LOCK:
+        if len(_SEARCH_CACHE) >= _SEARCH_CACHE_MAX:
+            _SEARCH_CACHE.clear()
+        _SEARCH_CACHE[key] = (time.monotonic(), value)
+
+
+# Lazily-built clients for the agentic path, shared across requests so
+# every call reuses warmed TLS connections to Azure Search and Azure
+# OpenAI instead of handshaking per request
+_agentic_clients = None
+_agentic_clients_lock = threading.Lock()
+
+
+def _get_agentic_clients():
+    """Return (search_client, azure_openai_client) for Agentic RAG, or
+    (None, None) when Search credentials are missing"""
+    global _agentic_clients
+    if _agentic_clients is None:
+        with _agentic_clients_lock:
+            if _agentic_clients is None:
+                search_client = None
+                azure_openai_client = None
+                endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
+                key = os.getenv("AZURE_SEARCH_ADMIN_KEY") or os.getenv("AZURE_SEARCH_KEY")
+                if endpoint and key:
+                    from azure.search.documents import SearchClient
+                    from azure.core.credentials import AzureKeyCredential
+                    search_client = SearchClient(
+                        endpoint=endpoint,
+                        index_name=os.getenv("AZURE_SEARCH_INDEX_NAME", "fitness-index"),
+                        credential=AzureKeyCredential(key)
+                    )
+                    # Async Azure OpenAI client so vision calls don't block
+                    # the agentic event loop
+                    try:
+                        from openai import AsyncAzureOpenAI
+                        azure_openai_client = AsyncAzureOpenAI(
+                            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-05-01-preview"),
+                            azure_endpoint=os.getenv("AZURE_OPENAI_API_ENDPOINT")
+                        )
+                    except Exception as e:
+                        logger.warning(f"Azure OpenAI client not available: {e}")
+                _agentic_clients = (search_client, azure_openai_client)
+    return _agentic_clients
+
+
+# One client (and its pooled SearchClient connection) shared across
+# requests; constructing these per call cost a TLS handshake each time
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client():
+    """Return the module-wide FitnessMCPClient, creating it on first use"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = FitnessMCPClient()
+    return _shared_client
+
+
 # MAIN FUNCTIONS USED BY APP.PY
 
 async def get_fitness_recommendation_mcp(images, gender, age, weight, height, agent_type, health_conditions=""):
     """Get MCP-enhanced fitness recommendation with fallback"""
     
+    user_data = {
+        'gender': gender,
+        'age': age,
+        'weight': weight,
+        'height': height,
+        'health_conditions': health_conditions,
+        'agent_type': agent_type
+    }
+    
     # Check if MCP is disabled via environment variable
-    if os.getenv("DISABLE_MCP", "false").lower() == "true":
+    if DISABLE_MCP:
         logger.info("MCP disabled via environment variable, using fallback")
-        user_data = {
-            'gender': gender,
-            'age': age,
-            'weight': weight,
-            'height': height,
-            'health_conditions': health_conditions,
-            'agent_type': agent_type
-        }
-        return get_fallback_fitness_recommendation(user_data, images)
+        return await asyncio.to_thread(get_fallback_fitness_recommendation, user_data, images)
     
     try:
-        user_data = {
-            'gender': gender,
-            'age': age,
-            'weight': weight,
-            'height': height,
-            'health_conditions': health_conditions,
-            'agent_type': agent_type
-        }
-        
-        # Since MCP is typically not available, go directly to fallback
-        return get_fallback_fitness_recommendation(user_data, images)
+        # Since MCP is typically not available, go directly to fallback.
+        # The fallback is fully synchronous, so run it in a worker thread;
+        # awaiting here gives callers' wait_for timeouts a real yield point.
+        return await asyncio.to_thread(get_fallback_fitness_recommendation, user_data, images)
         
     except Exception as e:
         logger.error(f"MCP recommendation failed: {e}")
-        user_data = {
-            'gender': gender,
-            'age': age,
-            'weight': weight,
-            'height': height,
-            'health_conditions': health_conditions,
-            'agent_type': agent_type
-        }
-        return get_fallback_fitness_recommendation(user_data, images)
+        return await asyncio.to_thread(get_fallback_fitness_recommendation, user_data, images)
 
 
 def get_fallback_fitness_recommendation(user_data, images):
@@ -120,38 +198,13 @@ def get_fallback_fitness_recommendation(user_data, images):
     agent_type = user_data.get('agent_type', 'general')
     health_conditions = user_data.get('health_conditions', '')
     
-    # Check if Agentic RAG is enabled
-    enable_agentic = os.getenv("ENABLE_AGENTIC_RAG", "false").lower() == "true"
-    
-    if enable_agentic and AZURE_SEARCH_AVAILABLE:
+    if ENABLE_AGENTIC_RAG and AZURE_SEARCH_AVAILABLE:
         try:
             logger.info("🤖 Using Agentic RAG for intelligent fitness recommendations")
             
-            # Initialize search client for Agentic RAG
-            endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
-            key = os.getenv("AZURE_SEARCH_ADMIN_KEY") or os.getenv("AZURE_SEARCH_KEY")
+            search_client, azure_openai_client = _get_agentic_clients()
             
-            if endpoint and key:
-                from azure.search.documents import SearchClient
-                from azure.core.credentials import AzureKeyCredential
-                search_client = SearchClient(
-                    endpoint=endpoint,
-                    index_name=os.getenv("AZURE_SEARCH_INDEX_NAME", "fitness-index"),
-                    credential=AzureKeyCredential(key)
-                )
-                
-                # Initialize Azure OpenAI client for image analysis
-                azure_openai_client = None
-                try:
-                    from openai import AzureOpenAI
-                    azure_openai_client = AzureOpenAI(
-                        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-                        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-05-01-preview"),
-                        azure_endpoint=os.getenv("AZURE_OPENAI_API_ENDPOINT")
-                    )
-                except Exception as e:
-                    logger.warning(f"Azure OpenAI client not available: {e}")
-                
+            if search_client:
                 from agentic_rag import AgenticFitnessRAG
                 agentic_agent = AgenticFitnessRAG(search_client, azure_openai_client)
                 
@@ -200,15 +253,14 @@ def get_fallback_fitness_recommendation(user_data, images):
                 
                 # Fallback to sync version if agentic fails
                 logger.info("Using sync enhanced fallback")
-                client = FitnessMCPClient()
-                return get_azure_search_enhanced_fallback_sync(user_data, images, client)
+                return get_azure_search_enhanced_fallback_sync(user_data, images, get_shared_client())
             
         except Exception as e:
             logger.warning(f"Agentic RAG failed: {e}, falling back to enhanced RAG")
     
     # Initialize Azure Search for enhanced fallback (non-agentic)
     try:
-        client = FitnessMCPClient()
+        client = get_shared_client()
         if client.search_client:
             logger.info("Using Azure Search enhanced fallback recommendations")
             return get_azure_search_enhanced_fallback_sync(user_data, images, client)
@@ -263,15 +315,20 @@ def get_azure_search_enhanced_fallback_sync(user_data, images, mcp_client):
         else:
             search_terms = ['beginner', 'general fitness', 'bodyweight']
         
-        # Search for exercises (sync version)
-        for term in search_terms[:2]:  # Limit searches
-            exercises = search_exercises_sync(mcp_client.search_client, term, user_profile)
-            relevant_exercises.extend(exercises[:3])  # Top 3 per search
-        
-        # Search for performance benchmarks (sync version)
-        performance_benchmarks = search_performance_benchmarks_sync(
-            mcp_client.search_client, agent_type, user_profile
-        )
+        # The exercise and benchmark queries are independent, so issue
+        # them concurrently instead of paying three round-trips in sequence
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            exercise_futures = [
+                executor.submit(search_exercises_sync, mcp_client.search_client, term, user_profile)
+                for term in search_terms[:2]  # Limit searches
+            ]
+            benchmark_future = executor.submit(
+                search_performance_benchmarks_sync,
+                mcp_client.search_client, agent_type, user_profile
+            )
+            for future in exercise_futures:
+                relevant_exercises.extend(future.result()[:3])  # Top 3 per search
+            performance_benchmarks = benchmark_future.result()
         
     except Exception as e:
         logger.error(f"Azure Search queries failed: {e}")
@@ -290,6 +347,12 @@ def search_exercises_sync(search_client, search_term, user_profile):
     if not search_client:
         return []
     
+    # The query below only varies with the term and the user's goal
+    cache_key = ('exercises', search_term, user_profile.get('goal'))
+    cached = _search_cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
         # Build search query based on user profile and search term
         query = f"{search_term}"
@@ -342,6 +405,7 @@ def search_exercises_sync(search_client, search_term, user_profile):
             exercises.append(exercise)
         
         logger.info(f"Found {len(exercises)} exercises for '{search_term}' and profile {user_profile.get('goal', 'general')}")
+        _search_cache_put(cache_key, exercises)
         return exercises
         
     except Exception as e:
@@ -349,21 +413,30 @@ def search_exercises_sync(search_client, search_term, user_profile):
         return []
 
 
+async def search_exercises_async(search_client, search_term, user_profile):
+    """Async wrapper around search_exercises_sync so callers can fan out
+    multiple search terms concurrently with asyncio.gather"""
+    return await asyncio.to_thread(search_exercises_sync, search_client, search_term, user_profile)
+
+
 def search_performance_benchmarks_sync(search_client, goal_type, user_profile):
     """Synchronous version of performance benchmark search"""
     if not search_client:
         return []
     
+    age = user_profile.get('age', 30)
+    gender = user_profile.get('gender', 'male')
+    # Age range query
+    age_range = "young" if age < 30 else "middle" if age < 50 else "mature"
+    
+    cache_key = ('benchmarks', goal_type, age_range, gender)
+    cached = _search_cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
         # Build query for performance data
         query = f"performance benchmark {goal_type}"
-        
-        # Add demographic filters
-        age = user_profile.get('age', 30)
-        gender = user_profile.get('gender', 'male')
-        
-        # Age range query
-        age_range = "young" if age < 30 else "middle" if age < 50 else "mature"
         query += f" {age_range} {gender}"
         
         search_params = {
@@ -387,6 +460,7 @@ def search_performance_benchmarks_sync(search_client, goal_type, user_profile):
             benchmarks.append(benchmark)
         
         logger.info(f"Found {len(benchmarks)} performance benchmarks for {goal_type}")
+        _search_cache_put(cache_key, benchmarks)
         return benchmarks
         
     except Exception as e:
@@ -840,27 +914,29 @@ def get_basic_fallback_recommendation(user_data, images):
 async def get_fitness_recommendation_with_rag(images, user_data):
     """Get RAG-enhanced fitness recommendation with fallback"""
     try:
-        # This is now handled by the fallback system
-        return get_fallback_fitness_recommendation(user_data, images)
+        # The fallback system handles this; offload its blocking work so a
+        # shared event loop can interleave other requests meanwhile
+        return await asyncio.to_thread(get_fallback_fitness_recommendation, user_data, images)
     except Exception as e:
         logger.error(f"RAG recommendation failed: {e}")
-        return get_fallback_fitness_recommendation(user_data, images)
+        return await asyncio.to_thread(get_fallback_fitness_recommendation, user_data, images)
 
 
 async def get_fitness_recommendation_hybrid(images, user_data):
     """Hybrid recommendation approach - delegates to fallback"""
     try:
         # Use the main fallback system which includes Agentic RAG
-        return get_fallback_fitness_recommendation(user_data, images)
+        return await asyncio.to_thread(get_fallback_fitness_recommendation, user_data, images)
     except Exception as e:
         logger.error(f"Hybrid recommendation failed: {e}")
-        return get_fallback_fitness_recommendation(user_data, images)
+        return await asyncio.to_thread(get_fallback_fitness_recommendation, user_data, images)
 
 
 # Sync wrappers for backward compatibility
-def get_fitness_recommendation_sync(images, gender, age, weight, agent_type):
+def get_fitness_recommendation_sync(images, gender, age, weight, height=None, agent_type='general', health_conditions=''):
     """Synchronous wrapper for basic MCP fitness recommendation"""
-    return asyncio.run(get_fitness_recommendation_mcp(images, gender, age, weight, agent_type))
+    return asyncio.run(get_fitness_recommendation_mcp(
+        images, gender, age, weight, height, agent_type, health_conditions))
 
 
 def get_fitness_recommendation_with_rag_sync(images, user_data):
@@ -1,6 +1,31 @@
 import asyncio
 import json
+import os
+import sys
+from types import MappingProxyType
 from typing import Any, Sequence
+
+# orjson serializes from C without building intermediate str fragments;
+# fall back to stdlib json when it isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Clients parse these payloads programmatically, so indentation is
+# cosmetic: compact output halves the bytes serialized and sent.
+# MCP_PRETTY=1 restores pretty-printing for manual debugging.
+_PRETTY = os.getenv("MCP_PRETTY", "0") == "1"
+
+
+def _dump(obj) -> str:
+    """Serialize a payload as JSON for TextContent/resource bodies"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if _PRETTY else 0).decode()
+    if _PRETTY:
+        return json.dumps(obj, indent=2)
+    return json.dumps(obj, separators=(",", ":"))
 from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions, Server
 from mcp.types import (
@@ -16,7 +41,9 @@ from pydantic import AnyUrl
 import logging
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+# Quiet by default so per-message INFO logs don't burn CPU under load;
+# raise with MCP_LOG_LEVEL=INFO or DEBUG when diagnosing
+logging.basicConfig(level=os.getenv("MCP_LOG_LEVEL", "WARNING"))
 logger = logging.getLogger("fitness-mcp-server")
 
 # Create the MCP server instance
@@ -124,9 +151,17 @@ FOOD_DATABASE = {
     }
 }
 
-@server.list_resources()
-async def handle_list_resources() -> list[Resource]:
-    """List available fitness resources"""
+def _freeze(table):
+    """Read-only view over a constant table, with interned keys so dict
+    probes hit the identity fast path"""
+    return MappingProxyType({sys.intern(key): value for key, value in table.items()})
+
+FITNESS_EXERCISES = _freeze(FITNESS_EXERCISES)
+NUTRITION_PLANS = _freeze(NUTRITION_PLANS)
+FOOD_DATABASE = _freeze(FOOD_DATABASE)
+
+def _build_resources() -> list[Resource]:
+    """Build Resource metadata for the constant fitness data"""
     resources = []
     
     # Add exercise resources
@@ -158,191 +193,230 @@ async def handle_list_resources() -> list[Resource]:
     
     return resources
 
+
+# The source dicts are module constants, so the pydantic models and URL
+# validation only need to happen once
+_RESOURCES_CACHE = _build_resources()
+
+# Resource bodies serialized once at import; a read becomes a dict lookup
+_EXERCISE_JSON = {k: _dump(v) for k, v in FITNESS_EXERCISES.items()}
+_NUTRITION_JSON = {k: _dump(v) for k, v in NUTRITION_PLANS.items()}
+_FOOD_JSON = {k: _dump(v) for k, v in FOOD_DATABASE.items()}
+
+# Harris-Benedict BMR coefficients and activity multipliers are
+# invariant; keep them at module scope instead of rebuilding per call
+_BMR_MALE = (88.362, 13.397, 4.799, 5.677)
+_BMR_FEMALE = (447.593, 9.247, 3.098, 4.330)
+_ACTIVITY_MULT = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725,
+    "very_active": 1.9
+}
+
+# Inverted indexes over the exercise catalog so recommendation queries
+# are set unions instead of scanning every exercise per target muscle
+_BY_MUSCLE: dict[str, set[str]] = {}
+for _exercise_id, _exercise_data in FITNESS_EXERCISES.items():
+    for _muscle in _exercise_data["muscle_groups"]:
+        _BY_MUSCLE.setdefault(_muscle, set()).add(_exercise_id)
+
+# Difficulty tags encoded once as small ints so the filter loops below
+# compare integers instead of re-walking string characters per exercise
+_DIFFICULTY_RANK = {"beginner": 0, "intermediate": 1, "advanced": 2}
+_EX_DIFF = {
+    exercise_id: _DIFFICULTY_RANK[exercise_data["difficulty"]]
+    for exercise_id, exercise_data in FITNESS_EXERCISES.items()
+}
+
+# Prefix -> serialized-body table for resource reads
+_RESOURCE_TABLES = {
+    "fitness://exercises": _EXERCISE_JSON,
+    "fitness://nutrition": _NUTRITION_JSON,
+    "fitness://foods": _FOOD_JSON,
+}
+
+
+@server.list_resources()
+async def handle_list_resources() -> list[Resource]:
+    """List available fitness resources"""
+    # Shallow copy so a caller mutating the list can't corrupt the cache
+    return list(_RESOURCES_CACHE)
+
 @server.read_resource()
 async def handle_read_resource(uri: AnyUrl) -> str:
     """Read a specific fitness resource"""
     uri_str = str(uri)
-    
-    if uri_str.startswith("fitness://exercises/"):
-        exercise_id = uri_str.split("/")[-1]
-        if exercise_id in FITNESS_EXERCISES:
-            return json.dumps(FITNESS_EXERCISES[exercise_id], indent=2)
-    
-    elif uri_str.startswith("fitness://nutrition/"):
-        plan_id = uri_str.split("/")[-1]
-        if plan_id in NUTRITION_PLANS:
-            return json.dumps(NUTRITION_PLANS[plan_id], indent=2)
-    
-    elif uri_str.startswith("fitness://foods/"):
-        food_id = uri_str.split("/")[-1]
-        if food_id in FOOD_DATABASE:
-            return json.dumps(FOOD_DATABASE[food_id], indent=2)
-    
-    raise ValueError(f"Resource not found: {uri}")
+    # One reverse scan for the last segment, then two hash lookups
+    prefix, _, resource_id = uri_str.rpartition("/")
+    table = _RESOURCE_TABLES.get(prefix)
+    blob = table.get(resource_id) if table is not None else None
+    if blob is None:
+        raise ValueError(f"Resource not found: {uri}")
+    return blob
 
-@server.list_tools()
-async def handle_list_tools() -> list[Tool]:
-    """List available fitness tools"""
-    return [
-        Tool(
-            name="create_workout_plan",
-            description="Create a personalized workout plan based on user goals and preferences",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "goal": {
-                        "type": "string",
-                        "enum": ["weight_loss", "muscle_gain", "endurance", "flexibility"],
-                        "description": "Primary fitness goal"
-                    },
-                    "fitness_level": {
-                        "type": "string",
-                        "enum": ["beginner", "intermediate", "advanced"],
-                        "description": "Current fitness level"
-                    },
-                    "available_equipment": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "List of available equipment"
-                    },
-                    "days_per_week": {
-                        "type": "integer",
-                        "minimum": 1,
-                        "maximum": 7,
-                        "description": "Number of workout days per week"
-                    }
+# Tool declarations are static; validate the pydantic models once at
+# import instead of per list_tools RPC
+_TOOLS: list[Tool] = [
+    Tool(
+        name="create_workout_plan",
+        description="Create a personalized workout plan based on user goals and preferences",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "goal": {
+                    "type": "string",
+                    "enum": ["weight_loss", "muscle_gain", "endurance", "flexibility"],
+                    "description": "Primary fitness goal"
+                },
+                "fitness_level": {
+                    "type": "string",
+                    "enum": ["beginner", "intermediate", "advanced"],
+                    "description": "Current fitness level"
+                },
+                "available_equipment": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "List of available equipment"
                 },
-                "required": ["goal", "fitness_level", "days_per_week"]
-            }
-        ),
-        Tool(
-            name="calculate_nutrition_needs",
-            description="Calculate daily nutrition needs based on user profile",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "age": {"type": "integer", "minimum": 10, "maximum": 100},
-                    "gender": {"type": "string", "enum": ["male", "female"]},
-                    "weight": {"type": "number", "minimum": 30},
-                    "height": {"type": "number", "minimum": 100},
-                    "activity_level": {
-                        "type": "string", 
-                        "enum": ["sedentary", "light", "moderate", "active", "very_active"]
-                    },
-                    "goal": {"type": "string", "enum": ["weight_loss", "maintenance", "muscle_gain"]}
+                "days_per_week": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 7,
+                    "description": "Number of workout days per week"
+                }
+            },
+            "required": ["goal", "fitness_level", "days_per_week"]
+        }
+    ),
+    Tool(
+        name="calculate_nutrition_needs",
+        description="Calculate daily nutrition needs based on user profile",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "age": {"type": "integer", "minimum": 10, "maximum": 100},
+                "gender": {"type": "string", "enum": ["male", "female"]},
+                "weight": {"type": "number", "minimum": 30},
+                "height": {"type": "number", "minimum": 100},
+                "activity_level": {
+                    "type": "string", 
+                    "enum": ["sedentary", "light", "moderate", "active", "very_active"]
                 },
-                "required": ["age", "gender", "weight", "height", "activity_level", "goal"]
-            }
-        ),
-        Tool(
-            name="get_exercise_recommendations",
-            description="Get exercise recommendations based on muscle groups and equipment",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "target_muscles": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "Target muscle groups"
-                    },
-                    "equipment": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "Available equipment"
-                    },
-                    "difficulty": {
-                        "type": "string",
-                        "enum": ["beginner", "intermediate", "advanced"],
-                        "description": "Exercise difficulty level"
-                    }
+                "goal": {"type": "string", "enum": ["weight_loss", "maintenance", "muscle_gain"]}
+            },
+            "required": ["age", "gender", "weight", "height", "activity_level", "goal"]
+        }
+    ),
+    Tool(
+        name="get_exercise_recommendations",
+        description="Get exercise recommendations based on muscle groups and equipment",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "target_muscles": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Target muscle groups"
                 },
-                "required": ["target_muscles"]
-            }
-        ),
-        Tool(
-            name="identify_food_nutrition",
-            description="Identify nutritional information for a specific food item",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "food_name": {
-                        "type": "string",
-                        "description": "Name of the food item to analyze"
-                    },
-                    "portion_size": {
-                        "type": "string",
-                        "description": "Portion size (e.g., '1 cup', '100g', 'medium')",
-                        "default": "standard serving"
-                    },
-                    "fitness_goal": {
-                        "type": "string",
-                        "enum": ["weight_loss", "muscle_gain", "maintenance"],
-                        "description": "User's fitness goal for context"
-                    }
+                "equipment": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Available equipment"
                 },
-                "required": ["food_name"]
-            }
-        ),
-        Tool(
-            name="generate_meal_plan",
-            description="Generate a complete meal plan based on nutrition goals",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "daily_calories": {
-                        "type": "integer",
-                        "minimum": 1200,
-                        "maximum": 4000,
-                        "description": "Target daily calories"
-                    },
-                    "fitness_goal": {
-                        "type": "string",
-                        "enum": ["weight_loss", "muscle_gain", "maintenance"],
-                        "description": "Primary fitness goal"
-                    },
-                    "dietary_restrictions": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "Dietary restrictions or preferences"
-                    },
-                    "meals_per_day": {
-                        "type": "integer",
-                        "minimum": 3,
-                        "maximum": 6,
-                        "description": "Number of meals per day",
-                        "default": 5
-                    }
+                "difficulty": {
+                    "type": "string",
+                    "enum": ["beginner", "intermediate", "advanced"],
+                    "description": "Exercise difficulty level"
+                }
+            },
+            "required": ["target_muscles"]
+        }
+    ),
+    Tool(
+        name="identify_food_nutrition",
+        description="Identify nutritional information for a specific food item",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "food_name": {
+                    "type": "string",
+                    "description": "Name of the food item to analyze"
                 },
-                "required": ["daily_calories", "fitness_goal"]
-            }
-        )
-    ]
+                "portion_size": {
+                    "type": "string",
+                    "description": "Portion size (e.g., '1 cup', '100g', 'medium')",
+                    "default": "standard serving"
+                },
+                "fitness_goal": {
+                    "type": "string",
+                    "enum": ["weight_loss", "muscle_gain", "maintenance"],
+                    "description": "User's fitness goal for context"
+                }
+            },
+            "required": ["food_name"]
+        }
+    ),
+    Tool(
+        name="generate_meal_plan",
+        description="Generate a complete meal plan based on nutrition goals",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "daily_calories": {
+                    "type": "integer",
+                    "minimum": 1200,
+                    "maximum": 4000,
+                    "description": "Target daily calories"
+                },
+                "fitness_goal": {
+                    "type": "string",
+                    "enum": ["weight_loss", "muscle_gain", "maintenance"],
+                    "description": "Primary fitness goal"
+                },
+                "dietary_restrictions": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Dietary restrictions or preferences"
+                },
+                "meals_per_day": {
+                    "type": "integer",
+                    "minimum": 3,
+                    "maximum": 6,
+                    "description": "Number of meals per day",
+                    "default": 5
+                }
+            },
+            "required": ["daily_calories", "fitness_goal"]
+        }
+    )
+]
+
+
+@server.list_tools()
+async def handle_list_tools() -> list[Tool]:
+    """List available fitness tools"""
+    # Shallow copy, same contract as handle_list_resources
+    return list(_TOOLS)
 
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: dict[str, Any] | None) -> list[types.TextContent]:
     """Handle tool calls"""
-    if not arguments:
-        arguments = {}
-    
-    if name == "create_workout_plan":
-        return await create_workout_plan(arguments)
-    elif name == "calculate_nutrition_needs":
-        return await calculate_nutrition_needs(arguments)
-    elif name == "get_exercise_recommendations":
-        return await get_exercise_recommendations(arguments)
-    elif name == "identify_food_nutrition":
-        return await identify_food_nutrition(arguments)
-    elif name == "generate_meal_plan":
-        return await generate_meal_plan(arguments)
-    else:
+    handler = _TOOL_DISPATCH.get(name)
+    if handler is None:
         raise ValueError(f"Unknown tool: {name}")
+    # Tool bodies are pure CPU, so they are plain functions; only this
+    # MCP boundary needs to be a coroutine
+    return handler(arguments or {})
 
-async def create_workout_plan(args: dict[str, Any]) -> list[TextContent]:
+def create_workout_plan(args: dict[str, Any]) -> list[TextContent]:
     """Create a personalized workout plan"""
     goal = args.get("goal")
     fitness_level = args.get("fitness_level")
     days_per_week = args.get("days_per_week", 3)
-    equipment = args.get("available_equipment", [])
+    # Hash lookups for the per-exercise membership tests below
+    equipment = frozenset(args.get("available_equipment") or ())
     
     # Simple workout plan generation logic
     plan = {
@@ -352,22 +426,26 @@ async def create_workout_plan(args: dict[str, Any]) -> list[TextContent]:
         "exercises": []
     }
     
-    # Add exercises based on goal and equipment
+    # Add exercises based on goal and equipment; the plan caps at six, so
+    # stop scanning as soon as that many match
     suitable_exercises = []
+    level_rank = _DIFFICULTY_RANK.get(fitness_level)
     for exercise_id, exercise_data in FITNESS_EXERCISES.items():
-        if exercise_data["difficulty"] == fitness_level or fitness_level == "intermediate":
+        if _EX_DIFF[exercise_id] == level_rank or level_rank == 1:
             if not equipment or exercise_data["equipment"] in equipment or exercise_data["equipment"] == "none":
                 suitable_exercises.append(exercise_data)
+                if len(suitable_exercises) == 6:
+                    break
     
-    plan["exercises"] = suitable_exercises[:6]  # Limit to 6 exercises
+    plan["exercises"] = suitable_exercises
     plan["recommendations"] = f"Focus on {goal.replace('_', ' ')} with {fitness_level} level exercises"
     
     return [TextContent(
         type="text",
-        text=json.dumps(plan, indent=2)
+        text=_dump(plan)
     )]
 
-async def calculate_nutrition_needs(args: dict[str, Any]) -> list[TextContent]:
+def calculate_nutrition_needs(args: dict[str, Any]) -> list[TextContent]:
     """Calculate daily nutrition needs"""
     age = args.get("age")
     gender = args.get("gender")
@@ -377,21 +455,10 @@ async def calculate_nutrition_needs(args: dict[str, Any]) -> list[TextContent]:
     goal = args.get("goal")
     
     # Basic BMR calculation (Harris-Benedict)
-    if gender == "male":
-        bmr = 88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age)
-    else:
-        bmr = 447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
+    base, per_kg, per_cm, per_year = _BMR_MALE if gender == "male" else _BMR_FEMALE
+    bmr = base + (per_kg * weight) + (per_cm * height) - (per_year * age)
     
-    # Activity multipliers
-    activity_multipliers = {
-        "sedentary": 1.2,
-        "light": 1.375,
-        "moderate": 1.55,
-        "active": 1.725,
-        "very_active": 1.9
-    }
-    
-    tdee = bmr * activity_multipliers.get(activity_level, 1.55)
+    tdee = bmr * _ACTIVITY_MULT.get(activity_level, 1.55)
     
     # Adjust for goal
     if goal == "weight_loss":
@@ -407,33 +474,37 @@ async def calculate_nutrition_needs(args: dict[str, Any]) -> list[TextContent]:
         "daily_calories": round(daily_calories),
         "goal": goal,
         "macros": {
-            "protein": f"{round(daily_calories * 0.3 / 4)}g (30%)",
-            "carbohydrates": f"{round(daily_calories * 0.4 / 4)}g (40%)",
-            "fat": f"{round(daily_calories * 0.3 / 9)}g (30%)"
+            # Fused calories-per-gram ratios: 0.3/4, 0.4/4, 0.3/9
+            "protein": f"{daily_calories * 0.075:.0f}g (30%)",
+            "carbohydrates": f"{daily_calories * 0.1:.0f}g (40%)",
+            "fat": f"{daily_calories / 30:.0f}g (30%)"
         },
-        "water_intake": f"{round(weight * 35)}ml per day"
+        "water_intake": f"{weight * 35:.0f}ml per day"
     }
     
     return [TextContent(
         type="text",
-        text=json.dumps(nutrition_plan, indent=2)
+        text=_dump(nutrition_plan)
     )]
 
-async def get_exercise_recommendations(args: dict[str, Any]) -> list[TextContent]:
+def get_exercise_recommendations(args: dict[str, Any]) -> list[TextContent]:
     """Get exercise recommendations"""
     target_muscles = args.get("target_muscles", [])
-    equipment = args.get("equipment", [])
+    equipment = frozenset(args.get("equipment") or ())
     difficulty = args.get("difficulty", "beginner")
     
+    # Union the per-muscle candidate sets, then filter the few survivors
+    candidates = set().union(*(_BY_MUSCLE.get(muscle, ()) for muscle in target_muscles)) if target_muscles else set()
+    
     recommendations = []
-    for exercise_id, exercise_data in FITNESS_EXERCISES.items():
-        # Check if exercise targets any of the requested muscles
-        if any(muscle in exercise_data["muscle_groups"] for muscle in target_muscles):
-            # Check equipment requirements
-            if not equipment or exercise_data["equipment"] in equipment or exercise_data["equipment"] == "none":
-                # Check difficulty
-                if exercise_data["difficulty"] == difficulty or difficulty == "intermediate":
-                    recommendations.append(exercise_data)
+    difficulty_rank = _DIFFICULTY_RANK.get(difficulty)
+    for exercise_id in sorted(candidates):
+        exercise_data = FITNESS_EXERCISES[exercise_id]
+        # Check equipment requirements
+        if not equipment or exercise_data["equipment"] in equipment or exercise_data["equipment"] == "none":
+            # Check difficulty
+            if _EX_DIFF[exercise_id] == difficulty_rank or difficulty_rank == 1:
+                recommendations.append(exercise_data)
     
     result = {
         "target_muscles": target_muscles,
@@ -443,10 +514,10 @@ async def get_exercise_recommendations(args: dict[str, Any]) -> list[TextContent
     
     return [TextContent(
         type="text",
-        text=json.dumps(result, indent=2)
+        text=_dump(result)
     )]
 
-async def identify_food_nutrition(args: dict[str, Any]) -> list[TextContent]:
+def identify_food_nutrition(args: dict[str, Any]) -> list[TextContent]:
     """Identify nutritional information for a food item"""
     food_name = args.get("food_name", "").lower()
     portion_size = args.get("portion_size", "standard serving")
@@ -487,10 +558,10 @@ async def identify_food_nutrition(args: dict[str, Any]) -> list[TextContent]:
     
     return [TextContent(
         type="text",
-        text=json.dumps(analysis, indent=2)
+        text=_dump(analysis)
     )]
 
-async def generate_meal_plan(args: dict[str, Any]) -> list[TextContent]:
+def generate_meal_plan(args: dict[str, Any]) -> list[TextContent]:
     """Generate a complete meal plan"""
     daily_calories = args.get("daily_calories", 2000)
     fitness_goal = args.get("fitness_goal", "maintenance")
@@ -540,9 +611,19 @@ async def generate_meal_plan(args: dict[str, Any]) -> list[TextContent]:
     
     return [TextContent(
         type="text",
-        text=json.dumps(meal_plan, indent=2)
+        text=_dump(meal_plan)
     )]
 
+# Tool name -> handler; hash dispatch instead of an if/elif chain
+_TOOL_DISPATCH = {
+    "create_workout_plan": create_workout_plan,
+    "calculate_nutrition_needs": calculate_nutrition_needs,
+    "get_exercise_recommendations": get_exercise_recommendations,
+    "identify_food_nutrition": identify_food_nutrition,
+    "generate_meal_plan": generate_meal_plan,
+}
+
+
 async def main():
     # Import here to avoid issues if mcp package isn't available
     from mcp.server.stdio import stdio_server
@@ -562,4 +643,9 @@ async def main():
         )
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass  # stdlib event loop works fine, uvloop is just faster
     asyncio.run(main())
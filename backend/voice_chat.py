@@ -5,9 +5,12 @@ import uuid
 import time
 import json
 import logging
+import threading
+import atexit
 import requests
 from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexClient  # Missing import
+from azure.core.pipeline.transport import RequestsTransport
 from azure.core.credentials import AzureKeyCredential
 from azure.core.exceptions import ResourceNotFoundError
 import openai
@@ -259,26 +262,81 @@ SESSION_CONFIGURATION = {
 # Azure Search client setup with proper error handling
 search_credential = AzureKeyCredential(AZURE_SEARCH_ADMIN_KEY) if AZURE_SEARCH_ADMIN_KEY else None
 
+# One pooled requests.Session shared by every Search client in this
+# module, so indexing and lookup calls reuse warm TLS connections
+# instead of handshaking per call (same pattern as ai.py)
+_search_session = requests.Session()
+_search_transport = RequestsTransport(session=_search_session, session_owner=False)
+
 # Initialize Azure Search client for fitness data (existing fitness-index)
 fitness_search_client = SearchClient(
     endpoint=AZURE_SEARCH_ENDPOINT,
     index_name=AZURE_SEARCH_INDEX_NAME,
-    credential=search_credential
+    credential=search_credential,
+    transport=_search_transport
 ) if AZURE_SEARCH_ENDPOINT and AZURE_SEARCH_ADMIN_KEY else None
 
 # Initialize Azure Search client for user data (separate user_data index)
 user_data_search_client = SearchClient(
     endpoint=AZURE_SEARCH_ENDPOINT,
     index_name=USER_DATA_INDEX,
-    credential=search_credential
+    credential=search_credential,
+    transport=_search_transport
 ) if AZURE_SEARCH_ENDPOINT and AZURE_SEARCH_ADMIN_KEY else None
 
 # Initialize Azure Search Index client for creating indexes
 index_client = SearchIndexClient(
     endpoint=AZURE_SEARCH_ENDPOINT,
-    credential=search_credential
+    credential=search_credential,
+    transport=_search_transport
 ) if AZURE_SEARCH_ENDPOINT and AZURE_SEARCH_ADMIN_KEY else None
 
+# Buffered writer for the user_data index: the store_* helpers enqueue
+# documents here and a short timer coalesces writes landing close
+# together (e.g. a recommendation followed by a weekly plan) into one
+# upload_documents batch instead of one indexing round-trip per call
+_PENDING_DOCS = []
+_PENDING_LOCK = threading.Lock()
+_PENDING_TIMER = None
+_FLUSH_MAX_DOCS = 100
+_FLUSH_INTERVAL_SECONDS = 0.5
+
+
+def _flush_pending_docs():
+    global _PENDING_TIMER
+    with _PENDING_LOCK:
+        batch = _PENDING_DOCS[:]
+        _PENDING_DOCS.clear()
+        if _PENDING_TIMER is not None:
+            _PENDING_TIMER.cancel()
+            _PENDING_TIMER = None
+    if not batch:
+        return
+    try:
+        result = user_data_search_client.upload_documents(batch)
+        success_count = sum(1 for r in result if r.succeeded)
+        logger.info(f"Flushed {success_count}/{len(batch)} buffered documents to user_data index")
+    except Exception as e:
+        logger.error(f"Error flushing buffered documents to Azure Search: {e}")
+
+
+def _queue_documents(documents):
+    """Enqueue documents for the buffered uploader; flushes immediately at
+    _FLUSH_MAX_DOCS, otherwise after a short coalescing window."""
+    global _PENDING_TIMER
+    with _PENDING_LOCK:
+        _PENDING_DOCS.extend(documents)
+        full = len(_PENDING_DOCS) >= _FLUSH_MAX_DOCS
+        if not full and _PENDING_TIMER is None:
+            _PENDING_TIMER = threading.Timer(_FLUSH_INTERVAL_SECONDS, _flush_pending_docs)
+            _PENDING_TIMER.daemon = True
+            _PENDING_TIMER.start()
+    if full:
+        _flush_pending_docs()
+
+
+atexit.register(_flush_pending_docs)
+
 # Optional - Use Azure OpenAI for voice transcription if available
 use_azure_openai = os.environ.get("USE_AZURE_OPENAI", "false").lower() == "true"
 if use_azure_openai:
@@ -407,12 +465,11 @@ def store_user_data_in_azure_search(user_email, user_profile, progress_data, rec
                 }
                 documents.append(rec_doc)
         
-        # Upload documents to Azure Search
+        # Hand off to the buffered uploader; per-document results are
+        # logged when the batch flushes
         if documents:
-            result = user_data_search_client.upload_documents(documents)
-            success_count = sum(1 for r in result if r.succeeded)
-            logger.info(f"Successfully stored {success_count}/{len(documents)} documents for {user_email}")
-            return success_count > 0
+            _queue_documents(documents)
+            logger.info(f"Queued {len(documents)} documents for {user_email}")
         
         return True
         
@@ -439,14 +496,10 @@ def store_food_recommendations_in_azure_search(user_email, recommendations_data)
             "created_at": datetime.utcnow().isoformat() + "Z"
         }
         
-        # Upload to Azure Search
-        result = user_data_search_client.upload_documents([document])
-        if result and len(result) > 0 and result[0].succeeded:
-            logger.info(f"Successfully stored food recommendations for {user_email}")
-            return True
-        else:
-            logger.error(f"Failed to store food recommendations for {user_email}")
-            return False
+        # Hand off to the buffered uploader
+        _queue_documents([document])
+        logger.info(f"Queued food recommendations for {user_email}")
+        return True
             
     except Exception as e:
         logger.error(f"Error storing food recommendations in Azure Search: {e}")
@@ -644,9 +697,9 @@ def store_weekly_plan_in_azure_search(user_email, weekly_plan):
             "is_active": True
         }
         
-        # Upload to Azure Search
-        result = user_data_search_client.upload_documents([plan_doc])
-        logger.info(f"🗓️ Stored weekly plan for {user_email}: {result}")
+        # Hand off to the buffered uploader
+        _queue_documents([plan_doc])
+        logger.info(f"🗓️ Queued weekly plan for {user_email}")
         return True
         
     except Exception as e:
@@ -1763,16 +1816,10 @@ except Exception as e:
 def get_user_food_recommendations_for_context(user_email):
     """Get user's food recommendations for context in food analysis"""
     try:
-        search_client = SearchClient(
-            endpoint=AZURE_SEARCH_ENDPOINT,
-            index_name=USER_DATA_INDEX,
-            credential=AzureKeyCredential(AZURE_SEARCH_ADMIN_KEY)
-        )
-        
         # Search for user's food recommendations
         safe_email = user_email.replace('@', '_at_').replace('.', '_dot_')
         
-        results = search_client.search(
+        results = user_data_search_client.search(
             search_text="",
             filter=f"user_email eq '{safe_email}' and data_type eq 'food_recommendations'",
             order_by=["created_at desc"],